@@ -1,17 +1,23 @@
 import asyncio
 import logging
+import math
 import os
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.types import Message
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject, StateFilter
 from dotenv import load_dotenv
+from bot_metrics import BotMetrics
+from rate_graph import RateGraph
 
 # Загрузка токена из .env файла
 load_dotenv()
 API_TOKEN = os.getenv("API_TOKEN")
+# Сводка метрик в лог (секунды, 0 - не писать) и локальный /metrics (порт)
+BOT_METRICS_SUMMARY_INTERVAL = float(os.getenv('BOT_METRICS_SUMMARY_INTERVAL', '300'))
+BOT_METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', '0'))
 
 # Включаем логирование
 logging.basicConfig(level=logging.DEBUG)
@@ -20,9 +26,18 @@ logger = logging.getLogger(__name__)
 # Инициализация бота
 bot = Bot(token=API_TOKEN)
 dp = Dispatcher(storage=MemoryStorage())
+bot_metrics = BotMetrics()
+bot_metrics.setup(dp, bot)
 
-# Хранилище курсов валют
-currency_data = {}
+# Курсы валют: котировки к рублю и прямые котировки пар
+rate_graph = RateGraph(base="RUB")
+
+# Сколько строк «сумма валюта» можно конвертировать одним сообщением
+MAX_CONVERT_LINES = 100
+# Ограничения строки, чтобы ответ оставался читаемым
+MAX_CONVERT_AMOUNT = 1e12
+MAX_CURRENCY_LENGTH = 10
+TELEGRAM_MESSAGE_LIMIT = 4096
 
 # Состояния
 class CurrencyState(StatesGroup):
@@ -43,7 +58,9 @@ async def cmd_start(message: types.Message, state: FSMContext):
         "Бот арбитражник.\n\n"
         "Вот что я умею:\n"
         "/save_currency — создать и сохранить валюту\n"
+        "/save_pair USD EUR 0.92 — прямая котировка пары (1 USD = 0.92 EUR)\n"
         "/convert — конвертировать\n"
+        "/arbitrage — найти арбитражные циклы\n"
         "/restart — сброс текущего процесса"
     )    
 
@@ -56,6 +73,10 @@ async def cmd_save_currency(message: Message, state: FSMContext):
 
 @dp.message(CurrencyState.waiting_for_currency_name)
 async def process_currency_name(message: Message, state: FSMContext):
+    if message.text.upper() == rate_graph.base:
+        await message.answer(f"{rate_graph.base} - базовая валюта, ее курс к рублю всегда 1")
+        await state.clear()
+        return
     await state.update_data(currency_name=message.text.upper())
     await message.answer(f"курс {message.text.upper()} к рублю:")
     await state.set_state(CurrencyState.waiting_for_currency_rate)
@@ -67,7 +88,7 @@ async def process_currency_rate(message: Message, state: FSMContext):
 
     try:
         rate = float(message.text.replace(",", "."))
-        currency_data[currency_name] = rate
+        rate_graph.set_rate(currency_name, "RUB", rate)
         await message.answer(f"Курс {currency_name} к рублю сохранен: {rate}")
         await message.answer("Теперь вы можете использовать команду /convert для конвертации.")
         await state.clear()
@@ -76,14 +97,69 @@ async def process_currency_rate(message: Message, state: FSMContext):
 
 # Команда /convert
 @dp.message(Command("convert"))
-async def cmd_convert(message: Message, state: FSMContext):
+async def cmd_convert(message: Message, state: FSMContext, command: CommandObject):
+    # "/convert 100 USD" или несколько строк - сразу, без диалога
+    if command.args:
+        await answer_conversions(message, command.args)
+        return
     await message.answer("название валюты которую хотите обменять")
     await state.set_state(ConvertState.waiting_for_convert_currency)
 
+def parse_conversions(text: str) -> list[tuple[float, str]]:
+    # Строки вида «100 USD»; ValueError с номером неверной строки
+    items = []
+    for number, line in enumerate(text.splitlines(), 1):
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            amount, currency = parts
+            amount = float(amount.replace(",", "."))
+            if not (math.isfinite(amount) and amount > 0):
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"строка {number}: нужно «сумма валюта», например 100 USD")
+        if amount > MAX_CONVERT_AMOUNT:
+            raise ValueError(f"строка {number}: сумма должна быть от 0 до {MAX_CONVERT_AMOUNT:g}")
+        if len(currency) > MAX_CURRENCY_LENGTH:
+            raise ValueError(f"строка {number}: код валюты не длиннее {MAX_CURRENCY_LENGTH} символов")
+        items.append((amount, currency.upper()))
+    if len(items) > MAX_CONVERT_LINES:
+        raise ValueError(f"не больше {MAX_CONVERT_LINES} строк за раз")
+    return items
+
+async def answer_conversions(message: Message, text: str):
+    try:
+        items = parse_conversions(text)
+    except ValueError as e:
+        await message.answer(str(e))
+        return
+    lines = []
+    for amount, currency in items:
+        rate = rate_graph.cross(currency, "RUB")
+        if rate is None:
+            lines.append(f"{amount} {currency}: такой валюты у нас нету")
+        else:
+            lines.append(f"{amount} {currency} = {amount * rate:.2f} RUB")
+    await answer_lines(message, lines)
+
+async def answer_lines(message: Message, lines: list[str]):
+    # Длинный ответ - несколькими сообщениями по границам строк
+    chunk, size = [], 0
+    for line in lines:
+        line = line[:TELEGRAM_MESSAGE_LIMIT]
+        if chunk and size + len(line) + 1 > TELEGRAM_MESSAGE_LIMIT:
+            await message.answer("\n".join(chunk))
+            chunk, size = [], 0
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        await message.answer("\n".join(chunk))
+
 @dp.message(ConvertState.waiting_for_convert_currency)
 async def process_convert_currency(message: Message, state: FSMContext):
     currency = message.text.upper()
-    if currency not in currency_data:
+    if rate_graph.cross(currency, "RUB") is None:
         await message.answer("такой валюты у нас нету")
         await state.clear()
         return
@@ -97,13 +173,40 @@ async def process_amount(message: Message, state: FSMContext):
     currency = user_data.get("currency")
     try:
         amount = float(message.text.replace(",", "."))
-        rate = currency_data[currency]
+        rate = rate_graph.cross(currency, "RUB")
         rubles = amount * rate
         await message.answer(f"{amount} {currency} = {rubles:.2f} RUB")
         await state.clear()
     except ValueError:
         await message.answer("введите правильное число.")
 
+# Команда /save_pair BASE QUOTE RATE — прямая котировка пары
+@dp.message(Command("save_pair"))
+async def cmd_save_pair(message: Message, command: CommandObject):
+    try:
+        base, quote, rate = (command.args or "").split()
+        base, quote = base.upper(), quote.upper()
+        rate_graph.set_rate(base, quote, float(rate.replace(",", ".")))
+    except ValueError:
+        await message.answer("формат: /save_pair USD EUR 0.92 (курс - положительное число, валюты разные)")
+        return
+    await message.answer(f"1 {base} = {rate_graph.cross(base, quote)} {quote} сохранено")
+
+# Команда /arbitrage — прибыльные циклы обмена
+@dp.message(Command("arbitrage"))
+async def cmd_arbitrage(message: Message):
+    cycles = rate_graph.find_arbitrage()
+    if not cycles:
+        await message.answer(f"арбитража нет ({len(rate_graph)} валют)")
+        return
+    lines = [f"{' → '.join(cycle)}: +{profit:.2%}" for cycle, profit in cycles]
+    await message.answer("арбитражные циклы:\n" + "\n".join(lines))
+
+# Сообщение из строк «сумма валюта» вне диалога - конвертация сразу
+@dp.message(StateFilter(None), F.text.regexp(r"^\s*\d"))
+async def convert_lines(message: Message):
+    await answer_conversions(message, message.text)
+
 # Команда /restart — сброс
 @dp.message(Command("restart"))
 async def cmd_restart(message: Message, state: FSMContext):
@@ -113,7 +216,11 @@ async def cmd_restart(message: Message, state: FSMContext):
 
 # Запуск бота
 async def main():
-    await dp.start_polling(bot)
+    await bot_metrics.start(BOT_METRICS_SUMMARY_INTERVAL, BOT_METRICS_PORT)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await bot_metrics.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
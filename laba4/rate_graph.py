@@ -0,0 +1,145 @@
+# Граф курсов валют для бота-арбитражника.
+#
+# direct[i, j] - сколько единиц j дают за единицу i по прямой котировке
+# (nan - котировки нет). Для котировки без явной обратной обратная
+# считается как 1 / курс. cross[i, j] - курс для конвертации: прямая
+# котировка, а если ее нет - кросс-курс через базовую валюту (RUB).
+# При сохранении котировки пересчитываются только строка и столбец
+# затронутых валют, O(n).
+#
+# Арбитраж - цикл обменов с произведением курсов > 1, т.е. отрицательный
+# цикл в графе с весами -log(курс). Ищется алгоритмом Беллмана-Форда,
+# где каждая итерация - одна векторная операция над матрицей n x n.
+import numpy as np
+
+
+class RateGraph:
+    def __init__(self, base: str = 'RUB', capacity: int = 16):
+        self.base = base
+        self.names: list[str] = []
+        self.index: dict[str, int] = {}
+        self._direct = np.full((capacity, capacity), np.nan)
+        self._explicit = np.zeros((capacity, capacity), dtype=bool)
+        self._cross = np.full((capacity, capacity), np.nan)
+        self._node(base)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _node(self, name: str) -> int:
+        i = self.index.get(name)
+        if i is not None:
+            return i
+        i = len(self.names)
+        if i == self._direct.shape[0]:
+            self._grow(2 * i)
+        self.names.append(name)
+        self.index[name] = i
+        self._direct[i, i] = self._cross[i, i] = 1.0
+        return i
+
+    def _grow(self, capacity: int):
+        n = len(self.names)
+        for attr, fill in (('_direct', np.nan), ('_cross', np.nan), ('_explicit', False)):
+            old = getattr(self, attr)
+            new = np.full((capacity, capacity), fill, dtype=old.dtype)
+            new[:n, :n] = old[:n, :n]
+            setattr(self, attr, new)
+
+    def set_rate(self, base: str, quote: str, rate: float):
+        # 1 base = rate quote
+        if not (np.isfinite(rate) and rate > 0):
+            raise ValueError("курс должен быть положительным числом")
+        # Проверки до _node: отклоненная пара не должна добавлять валюту
+        if base == quote:
+            raise ValueError("валюты пары совпадают")
+        i, j = self._node(base), self._node(quote)
+        self._direct[i, j] = rate
+        self._explicit[i, j] = True
+        if not self._explicit[j, i]:
+            self._direct[j, i] = 1.0 / rate
+        self._update_cross(i)
+        self._update_cross(j)
+
+    def _update_cross(self, i: int):
+        # Строка и столбец i: прямая котировка или через базовую валюту
+        n = len(self.names)
+        direct = self._direct[:n, :n]
+        to_base = direct[:, 0]
+        with np.errstate(invalid='ignore'):
+            row = to_base[i] / to_base
+            col = to_base / to_base[i]
+        self._cross[i, :n] = np.where(np.isnan(direct[i]), row, direct[i])
+        self._cross[:n, i] = np.where(np.isnan(direct[:, i]), col, direct[:, i])
+
+    def cross(self, base: str, quote: str) -> float | None:
+        i, j = self.index.get(base), self.index.get(quote)
+        if i is None or j is None:
+            return None
+        rate = self._cross[i, j]
+        return None if np.isnan(rate) else float(rate)
+
+    def cross_matrix(self) -> np.ndarray:
+        n = len(self.names)
+        return self._cross[:n, :n].copy()
+
+    def find_arbitrage(self, max_cycles: int = 5, eps: float = 1e-9) -> list[tuple[list[str], float]]:
+        # [(валюты цикла, прибыль за круг в долях), ...] по убыванию прибыли -
+        # циклы с первой итерации, на которой они появились
+        n = len(self.names)
+        rates = self._direct[:n, :n]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = -np.log(rates)
+        weights[~np.isfinite(weights)] = np.inf
+        np.fill_diagonal(weights, np.inf)
+
+        # Виртуальный источник с ребрами нулевого веса во все вершины. Цикл в
+        # графе предков всегда отрицательный, поэтому проверяем его после
+        # каждой итерации и не ждем все n итераций.
+        dist = np.zeros(n)
+        pred = np.full(n, -1)
+        columns = np.arange(n)
+        for _ in range(n):
+            candidates = dist[:, None] + weights
+            best_from = candidates.argmin(axis=0)
+            best = candidates[best_from, columns]
+            improved = best < dist - eps
+            if not improved.any():
+                return []
+            dist = np.where(improved, best, dist)
+            pred = np.where(improved, best_from, pred)
+            cycles = {}
+            for cycle in _predecessor_cycles(pred.tolist()):
+                start = cycle.index(min(cycle))
+                cycle = tuple(cycle[start:] + cycle[:start])
+                product = float(np.prod(rates[list(cycle), list(cycle[1:] + cycle[:1])]))
+                if product > 1 + eps:
+                    cycles[cycle] = product - 1
+            if cycles:
+                break
+        else:
+            return []
+
+        found = sorted(cycles.items(), key=lambda item: -item[1])[:max_cycles]
+        return [([self.names[i] for i in cycle] + [self.names[cycle[0]]], profit) for cycle, profit in found]
+
+
+def _predecessor_cycles(pred: list[int]) -> list[list[int]]:
+    # Циклы функционального графа v -> pred[v], вершины в порядке обмена
+    state = [0] * len(pred)  # 0 - не видели, 1 - на текущем пути, 2 - разобрана
+    cycles = []
+    for start in range(len(pred)):
+        path = []
+        v = start
+        while v != -1 and state[v] == 0:
+            state[v] = 1
+            path.append(v)
+            v = pred[v]
+        if v != -1 and state[v] == 1:
+            cycles.append(path[path.index(v):][::-1])
+        for u in path:
+            state[u] = 2
+    return cycles
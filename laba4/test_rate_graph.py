@@ -0,0 +1,129 @@
+import itertools
+import math
+import random
+import unittest
+
+import numpy as np
+
+from rate_graph import RateGraph
+
+
+def brute_force_profitable(graph: RateGraph, max_len: int = 4) -> bool:
+    # Есть ли цикл обменов по прямым котировкам с произведением курсов > 1
+    n = len(graph)
+    rates = graph._direct[:n, :n]
+    for length in range(2, max_len + 1):
+        for cycle in itertools.permutations(range(n), length):
+            product = 1.0
+            for a, b in zip(cycle, cycle[1:] + cycle[:1]):
+                product *= rates[a, b]
+            if product > 1 + 1e-9:
+                return True
+    return False
+
+
+class TestArbitrage(unittest.TestCase):
+    def test_known_cycle(self):
+        graph = RateGraph()
+        graph.set_rate('USD', 'RUB', 90)
+        graph.set_rate('EUR', 'RUB', 100)
+        # 1 USD -> 0.95 EUR -> 95 RUB -> 95/90 USD: +5.56%
+        graph.set_rate('USD', 'EUR', 0.95)
+        cycles = graph.find_arbitrage()
+        self.assertTrue(cycles)
+        cycle, profit = cycles[0]
+        self.assertEqual(cycle[0], cycle[-1])
+        self.assertEqual(set(cycle), {'USD', 'EUR', 'RUB'})
+        self.assertAlmostEqual(profit, 0.95 * 100 / 90 - 1)
+        # Цикл действительно прибыльный по сохраненным котировкам
+        product = math.prod(graph._direct[graph.index[a], graph.index[b]] for a, b in zip(cycle, cycle[1:]))
+        self.assertAlmostEqual(product - 1, profit)
+
+    def test_no_arbitrage(self):
+        graph = RateGraph()
+        graph.set_rate('USD', 'RUB', 90)
+        graph.set_rate('EUR', 'RUB', 100)
+        graph.set_rate('USD', 'EUR', 0.9)  # ровно кросс-курс
+        self.assertEqual(graph.find_arbitrage(), [])
+        self.assertEqual(RateGraph().find_arbitrage(), [])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            graph = RateGraph()
+            names = ['USD', 'EUR', 'CNY', 'KZT']
+            for name in names:
+                graph.set_rate(name, 'RUB', rng.uniform(1, 100))
+            # Половина графов - котировки ровно по кросс-курсу, без арбитража
+            spread = 0.03 if rng.random() < 0.5 else 0
+            for base, quote in rng.sample(list(itertools.permutations(names, 2)), 3):
+                fair = graph.cross(base, quote)
+                graph.set_rate(base, quote, fair * rng.uniform(1 - spread, 1 + spread))
+            found = graph.find_arbitrage()
+            self.assertEqual(bool(found), brute_force_profitable(graph, max_len=5))
+            for cycle, profit in found:
+                product = math.prod(graph._direct[graph.index[a], graph.index[b]] for a, b in zip(cycle, cycle[1:]))
+                self.assertAlmostEqual(product - 1, profit)
+                self.assertGreater(profit, 0)
+
+
+class TestCrossRates(unittest.TestCase):
+    def full_cross(self, graph: RateGraph) -> np.ndarray:
+        # Пересчет всей матрицы с нуля для сравнения с инкрементальным
+        n = len(graph)
+        direct = graph._direct[:n, :n]
+        to_base = direct[:, 0]
+        with np.errstate(invalid='ignore'):
+            via_base = to_base[:, None] / to_base[None, :]
+        return np.where(np.isnan(direct), via_base, direct)
+
+    def test_cross_via_base(self):
+        graph = RateGraph()
+        graph.set_rate('USD', 'RUB', 90)
+        graph.set_rate('EUR', 'RUB', 100)
+        self.assertAlmostEqual(graph.cross('EUR', 'USD'), 100 / 90)
+        self.assertAlmostEqual(graph.cross('RUB', 'USD'), 1 / 90)
+        self.assertIsNone(graph.cross('USD', 'XXX'))
+
+    def test_requote_updates_cross(self):
+        graph = RateGraph()
+        graph.set_rate('USD', 'RUB', 90)
+        graph.set_rate('EUR', 'RUB', 100)
+        graph.set_rate('USD', 'EUR', 0.95)
+        # Переоценка USD к рублю меняет кросс-курсы через базу, но не прямую пару
+        graph.set_rate('USD', 'RUB', 80)
+        self.assertAlmostEqual(graph.cross('USD', 'EUR'), 0.95)
+        self.assertAlmostEqual(graph.cross('EUR', 'USD'), 1 / 0.95)
+        self.assertAlmostEqual(graph.cross('RUB', 'USD'), 1 / 80)
+        graph.set_rate('CNY', 'RUB', 12)
+        self.assertAlmostEqual(graph.cross('CNY', 'USD'), 12 / 80)
+        np.testing.assert_allclose(graph.cross_matrix(), self.full_cross(graph))
+
+    def test_incremental_matches_full_recompute(self):
+        rng = random.Random(3)
+        graph = RateGraph(capacity=2)  # заодно проверяем рост матриц
+        names = ['USD', 'EUR', 'CNY', 'KZT', 'TRY']
+        for _ in range(200):
+            base, quote = rng.sample(names + ['RUB'], 2)
+            graph.set_rate(base, quote, rng.uniform(0.01, 100))
+            np.testing.assert_allclose(graph.cross_matrix(), self.full_cross(graph))
+
+    def test_invalid_rates(self):
+        graph = RateGraph()
+        for rate in (0, -1, float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                graph.set_rate('USD', 'RUB', rate)
+        with self.assertRaises(ValueError):
+            graph.set_rate('RUB', 'RUB', 1)
+        # Отклоненная котировка не оставляет валюту в графе
+        with self.assertRaises(ValueError):
+            graph.set_rate('XXX', 'XXX', 1)
+        with self.assertRaises(ValueError):
+            graph.set_rate('YYY', 'RUB', 0)
+        self.assertEqual(len(graph), 1)
+        self.assertNotIn('XXX', graph)
+        self.assertNotIn('YYY', graph)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# Множество chat_id администраторов в памяти. Загружается при старте,
+# пополняется write-through из /add_admin и обновляется лентой изменений
+# (changes.py), так что проверка прав не ходит в базу. chat_id хранятся
+# строками независимо от источника (база, уведомление, команда).
+import db
+
+
+class AdminSet:
+    def __init__(self):
+        self._chat_ids: set[str] = set()
+
+    async def load(self):
+        rows = await db.fetch("SELECT chat_id FROM admins")
+        self._chat_ids = {str(row['chat_id']) for row in rows}
+
+    def __contains__(self, chat_id) -> bool:
+        return str(chat_id) in self._chat_ids
+
+    def __iter__(self):
+        return iter(list(self._chat_ids))
+
+    def __len__(self) -> int:
+        return len(self._chat_ids)
+
+    async def add(self, chat_id: int):
+        # asyncpg.UniqueViolationError, если уже админ
+        await db.execute("INSERT INTO admins (chat_id) VALUES ($1)", str(chat_id))
+        self._chat_ids.add(str(chat_id))
+
+    def apply_change(self, change: dict):
+        if change['op'] == 'TRUNCATE':
+            self._chat_ids = set()
+            return
+        if change.get('old'):
+            self._chat_ids.discard(str(change['old']['chat_id']))
+        if change.get('new'):
+            self._chat_ids.add(str(change['new']['chat_id']))
@@ -0,0 +1,189 @@
+# Метрики aiogram-бота: время обработки апдейта по обработчику и состоянию
+# FSM, время в БД и во внешних HTTP-запросах (в т.ч. к Telegram), ошибки.
+# Гистограммы и счетчики - из metrics.py; периодическая сводка пишется в
+# лог, по желанию поднимается локальный /metrics для Prometheus.
+#
+#   bot_metrics = BotMetrics()
+#   bot_metrics.setup(dp, bot)
+#   with bot_metrics.timed('db', 'postgres'): ...
+#   await bot_metrics.start(summary_interval=300, port=9101)
+#
+# Правится в rgz/bot_metrics.py и копируется в laba4 и laba5;
+# rgz/test_shared_copies.py падает, если копии разошлись.
+import asyncio
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+import aiohttp
+from aiohttp import web
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Учет текущего апдейта: обработчик и время по видам внешних вызовов
+_current = contextvars.ContextVar('bot_metrics_update', default=None)
+
+
+class _UpdateRecord:
+    __slots__ = ('handler', 'dependencies')
+
+    def __init__(self):
+        self.handler = 'unhandled'
+        self.dependencies = {}
+
+
+class _TelegramRequests(BaseRequestMiddleware):
+    def __init__(self, bot_metrics):
+        self.bot_metrics = bot_metrics
+
+    async def __call__(self, make_request, bot, method):
+        with self.bot_metrics.timed('http', f"telegram:{method.__api_method__}"):
+            return await make_request(bot, method)
+
+
+class _ErrorLogCounter(logging.Handler):
+    # Обработчики ловят исключения сами и пишут их в лог - считаем и такие
+    def __init__(self, bot_metrics):
+        super().__init__(logging.ERROR)
+        self.bot_metrics = bot_metrics
+
+    def emit(self, record):
+        update = _current.get()
+        if update is not None:
+            self.bot_metrics.handler_errors.inc(update.handler, 'logged')
+
+
+class BotMetrics:
+    def __init__(self, registry: metrics.Registry | None = None):
+        self.registry = registry or metrics.Registry()
+        self.handler_latency = self.registry.histogram(
+            'bot_handler_duration_seconds', 'Время обработки апдейта', ['handler', 'state'])
+        self.handler_errors = self.registry.counter(
+            'bot_handler_errors_total', 'Ошибки обработчиков', ['handler', 'error'])
+        self.dependency_latency = self.registry.histogram(
+            'bot_dependency_duration_seconds', 'Время одного обращения к БД или HTTP', ['kind', 'target'])
+        self.handler_dependency_time = self.registry.histogram(
+            'bot_handler_dependency_seconds', 'Время во внешних вызовах за один апдейт', ['handler', 'kind'])
+        self._last_latency = {}
+        self._tasks = []
+        self._runner: web.AppRunner | None = None
+
+    def setup(self, dp, bot=None):
+        # Внешний middleware на апдейт регистрируется после FSM, поэтому
+        # состояние уже известно; внутренние на событиях узнают обработчик
+        dp.update.outer_middleware(self._measure_update)
+        for name, observer in dp.observers.items():
+            if name not in ('update', 'error'):
+                observer.middleware(self._mark_handler)
+        if bot is not None:
+            bot.session.middleware(_TelegramRequests(self))
+        logging.getLogger().addHandler(_ErrorLogCounter(self))
+
+    async def _measure_update(self, handler, event, data):
+        update = _UpdateRecord()
+        token = _current.set(update)
+        state = data.get('raw_state') or 'none'
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.handler_errors.inc(update.handler, type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            self.handler_latency.observe(elapsed, update.handler, state)
+            for kind, spent in update.dependencies.items():
+                self.handler_dependency_time.observe(spent, update.handler, kind)
+
+    async def _mark_handler(self, handler, event, data):
+        update = _current.get()
+        if update is not None:
+            update.handler = data['handler'].callback.__name__
+        return await handler(event, data)
+
+    def observe_dependency(self, kind: str, target: str, elapsed: float):
+        self.dependency_latency.observe(elapsed, kind, target)
+        update = _current.get()
+        if update is not None:
+            update.dependencies[kind] = update.dependencies.get(kind, 0) + elapsed
+
+    @contextmanager
+    def timed(self, kind: str, target: str = ''):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_dependency(kind, target, time.perf_counter() - start)
+
+    def http_trace_config(self) -> aiohttp.TraceConfig:
+        # Для собственных aiohttp-сессий бота: ClientSession(trace_configs=[...])
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_start(session, context, params):
+            context.started = time.perf_counter()
+
+        async def on_finish(session, context, params):
+            self.observe_dependency('http', params.url.host or '', time.perf_counter() - context.started)
+
+        trace_config.on_request_start.append(on_start)
+        trace_config.on_request_end.append(on_finish)
+        trace_config.on_request_exception.append(on_finish)
+        return trace_config
+
+    def summary(self) -> list[str]:
+        # Обработчики за период с прошлой сводки: число, p50/p99, ошибки
+        current = self.handler_latency.snapshot()
+        buckets = self.handler_latency.buckets
+        lines = []
+        for (handler, state), (counts, total) in sorted(current.items()):
+            last_counts, last_total = self._last_latency.get((handler, state), ([0] * len(counts), 0.0))
+            delta = [now - before for now, before in zip(counts, last_counts)]
+            count = sum(delta)
+            if not count:
+                continue
+            p50 = metrics.quantile(delta, buckets, 0.5)
+            p99 = metrics.quantile(delta, buckets, 0.99)
+            lines.append(
+                f"{handler} [{state}]: {count} шт., среднее {(total - last_total) / count * 1000:.1f} мс, "
+                f"p50 <= {p50 * 1000:g} мс, p99 <= {p99 * 1000:g} мс"
+            )
+        self._last_latency = current
+
+        errors = [f"{handler}/{error}: {int(value)}" for (handler, error), value in self.handler_errors.values().items()]
+        if errors:
+            lines.append("ошибки (всего): " + ", ".join(sorted(errors)))
+        return lines
+
+    async def _summary_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            lines = self.summary()
+            if lines:
+                logger.info("Метрики обработчиков:\n" + "\n".join(lines))
+
+    async def _metrics_handler(self, request):
+        return web.Response(body=self.registry.render().encode(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+    async def start(self, summary_interval: float = 300, port: int | None = None, host: str = '127.0.0.1'):
+        if summary_interval:
+            self._tasks.append(asyncio.create_task(self._summary_loop(summary_interval)))
+        if port:
+            app = web.Application()
+            app.router.add_get('/metrics', self._metrics_handler)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, host, port).start()
+            logger.info(f"Метрики бота: http://{host}:{port}/metrics")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
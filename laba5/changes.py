@@ -0,0 +1,121 @@
+# Лента изменений таблиц currencies и admins. Триггеры (db.SCHEMA) шлют
+# pg_notify в канал laba5_changes, каждый экземпляр бота слушает его на
+# отдельном соединении и обновляет свои кэши за миллисекунды. После
+# каждого подключения кэши перечитываются целиком: уведомления, пришедшие
+# до LISTEN или во время обрыва, потеряны. Уведомления, пришедшие во время
+# перечитывания, откладываются и применяются после него - иначе load()
+# затер бы их своим (более старым) снимком. Соединение раз в
+# keepalive_interval проверяется SELECT 1: полуоткрытый сокет иначе
+# оставил бы кэши устаревшими без единой ошибки.
+import asyncio
+import json
+import logging
+from decimal import Decimal
+
+import asyncpg
+
+import db
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'laba5_changes'
+
+
+class ChangeFeed:
+    def __init__(self, config: dict = db.DB_CONFIG, retry_delay: float = 1, max_retry_delay: float = 30,
+                 keepalive_interval: float = 30, keepalive_timeout: float = 10):
+        self.config = config
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_timeout = keepalive_timeout
+        # таблица -> [обработчик(change)]; change - dict с table, op, old, new
+        self.handlers: dict[str, list] = {}
+        # async-функции полной перезагрузки кэшей после переподключения
+        self.resync: list = []
+        self.connected = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Уведомления, отложенные на время resync (None - применяются сразу)
+        self._pending: list | None = None
+
+    def on(self, table: str, handler):
+        self.handlers.setdefault(table, []).append(handler)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _dispatch(self, connection, pid, channel, payload):
+        try:
+            change = json.loads(payload, parse_float=Decimal)
+        except ValueError:
+            logger.warning(f"Непонятное уведомление: {payload}")
+            return
+        if self._pending is not None:
+            self._pending.append(change)
+            return
+        self._apply(change)
+
+    def _apply(self, change: dict):
+        for handler in self.handlers.get(change.get('table'), []):
+            try:
+                handler(change)
+            except Exception as e:
+                logger.error(f"Ошибка обработки изменения {change}: {e}")
+
+    async def _run(self):
+        delay = self.retry_delay
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(**self.config)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                self._pending = []
+                await conn.add_listener(CHANNEL, self._dispatch)
+                # Изменения до LISTEN (или за время обрыва) могли пройти мимо
+                for reload in self.resync:
+                    await reload()
+                pending, self._pending = self._pending, None
+                for change in pending:
+                    self._apply(change)
+                delay = self.retry_delay
+                self.connected.set()
+                logger.info("Подписка на изменения таблиц установлена")
+                await self._watch(conn, closed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Лента изменений недоступна: {e}")
+            finally:
+                self._pending = None
+                self.connected.clear()
+                if conn is not None and not conn.is_closed():
+                    # Без вежливого закрытия: сокет может быть полуоткрытым
+                    conn.terminate()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    async def _watch(self, conn, closed: asyncio.Event):
+        # Ждем закрытия соединения, периодически проверяя, что оно живо
+        while True:
+            try:
+                await asyncio.wait_for(closed.wait(), self.keepalive_interval)
+                logger.warning("Соединение ленты изменений закрыто")
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await conn.fetchval("SELECT 1", timeout=self.keepalive_timeout)
+            except (asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError, OSError) as e:
+                logger.warning(f"Соединение ленты изменений не отвечает: {e!r}")
+                return
@@ -0,0 +1,77 @@
+# Таблица валют в памяти. Загружается при старте, изменения от админов
+# пишутся сначала в базу, затем в индекс (write-through), так что чтение
+# курсов пользователями обходится без запросов к базе. Ответ
+# /get_currencies собирается заново только при изменении.
+from decimal import Decimal
+
+import db
+
+
+class CurrencyTable:
+    def __init__(self):
+        self._rates: dict[str, Decimal] = {}
+        self._rendered = None
+
+    async def load(self):
+        rows = await db.fetch("SELECT currency_name, rate FROM currencies")
+        self._rates = {row['currency_name']: row['rate'] for row in rows}
+        self._rendered = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rates
+
+    def get(self, name: str) -> Decimal | None:
+        return self._rates.get(name)
+
+    def get_many(self, names) -> dict[str, Decimal]:
+        # Курсы сразу для нескольких валют; неизвестных в ответе нет
+        rates = self._rates
+        return {name: rates[name] for name in names if name in rates}
+
+    def render(self) -> str:
+        if self._rendered is None:
+            if not self._rates:
+                self._rendered = "В базе данных нет сохраненных валют"
+            else:
+                self._rendered = "Текущие курсы валют к рублю:\n\n" + "\n".join(
+                    f"{name}: {self._rates[name]}" for name in sorted(self._rates)
+                )
+        return self._rendered
+
+    def _set(self, name: str, rate: Decimal | None):
+        if rate is None:
+            self._rates.pop(name, None)
+        else:
+            self._rates[name] = rate
+        self._rendered = None
+
+    def apply_change(self, change: dict):
+        # Уведомление из ленты изменений (changes.py) - от себя или другого экземпляра
+        if change['op'] == 'TRUNCATE':
+            self._rates = {}
+            self._rendered = None
+            return
+        if change.get('old'):
+            self._set(change['old']['currency_name'], None)
+        if change.get('new'):
+            self._set(change['new']['currency_name'], Decimal(str(change['new']['rate'])))
+
+    async def add(self, name: str, rate: Decimal) -> Decimal:
+        # asyncpg.UniqueViolationError, если валюта уже есть
+        stored = await db.fetchval(
+            "INSERT INTO currencies (currency_name, rate) VALUES ($1, $2) RETURNING rate", name, rate
+        )
+        self._set(name, stored)
+        return stored
+
+    async def delete(self, name: str) -> bool:
+        deleted = await db.fetchval("DELETE FROM currencies WHERE currency_name = $1 RETURNING id", name)
+        self._set(name, None)
+        return deleted is not None
+
+    async def set_rate(self, name: str, rate: Decimal) -> Decimal | None:
+        stored = await db.fetchval(
+            "UPDATE currencies SET rate = $1 WHERE currency_name = $2 RETURNING rate", rate, name
+        )
+        self._set(name, stored)
+        return stored
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+import asyncpg
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DB_CONFIG = {
+    "user": os.getenv('DB_USER', 'postgres'),
+    "password": os.getenv('DB_PASSWORD', 'postgres'),
+    "database": os.getenv('DB_NAME', 'postgres'),
+    "host": os.getenv('DB_HOST', 'localhost'),
+    "port": int(os.getenv('DB_PORT', '5433'))
+}
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+# Сколько раз повторять запрос при обрыве соединения
+DB_RETRIES = int(os.getenv('DB_RETRIES', '2'))
+
+# Ошибки, после которых соединение выбрасывается из пула и запрос может
+# быть повторен на новом (см. _run): перезапуск Postgres, обрыв сети
+CONNECTION_ERRORS = (
+    asyncpg.PostgresConnectionError,
+    asyncpg.AdminShutdownError,
+    asyncpg.CannotConnectNowError,
+    ConnectionError,
+    OSError,
+)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS currencies (
+        id SERIAL PRIMARY KEY,
+        currency_name VARCHAR(10) NOT NULL UNIQUE,
+        rate NUMERIC NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS admins (
+        id SERIAL PRIMARY KEY,
+        chat_id VARCHAR(32) NOT NULL UNIQUE
+    );
+
+    -- Лента изменений для кэшей всех экземпляров бота (см. changes.py)
+    CREATE OR REPLACE FUNCTION laba5_notify_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('laba5_changes', json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'old', CASE WHEN TG_LEVEL = 'ROW' AND TG_OP IN ('UPDATE', 'DELETE') THEN to_jsonb(OLD) END,
+            'new', CASE WHEN TG_LEVEL = 'ROW' AND TG_OP IN ('INSERT', 'UPDATE') THEN to_jsonb(NEW) END
+        )::text);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS currencies_notify ON currencies;
+    CREATE TRIGGER currencies_notify AFTER INSERT OR UPDATE OR DELETE ON currencies
+        FOR EACH ROW EXECUTE FUNCTION laba5_notify_change();
+    DROP TRIGGER IF EXISTS currencies_notify_truncate ON currencies;
+    CREATE TRIGGER currencies_notify_truncate AFTER TRUNCATE ON currencies
+        FOR EACH STATEMENT EXECUTE FUNCTION laba5_notify_change();
+
+    DROP TRIGGER IF EXISTS admins_notify ON admins;
+    CREATE TRIGGER admins_notify AFTER INSERT OR UPDATE OR DELETE ON admins
+        FOR EACH ROW EXECUTE FUNCTION laba5_notify_change();
+    DROP TRIGGER IF EXISTS admins_notify_truncate ON admins;
+    CREATE TRIGGER admins_notify_truncate AFTER TRUNCATE ON admins
+        FOR EACH STATEMENT EXECUTE FUNCTION laba5_notify_change();
+"""
+
+# Общий пул соединений, создается при старте диспетчера
+pool: asyncpg.Pool | None = None
+acquire_timeout: float = DB_POOL_TIMEOUT
+# Вызываются с длительностью каждого использования соединения (метрики бота)
+timing_listeners = []
+
+
+async def create_pool(config: dict = DB_CONFIG, min_size: int = DB_POOL_MIN_SIZE,
+                      max_size: int = DB_POOL_MAX_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                      attempts: int = 5):
+    # Postgres может подняться позже бота - ждем с нарастающей паузой
+    global pool, acquire_timeout
+    acquire_timeout = timeout
+    for attempt in range(1, attempts + 1):
+        try:
+            pool = await asyncpg.create_pool(min_size=min_size, max_size=max_size, **config)
+            break
+        except CONNECTION_ERRORS as e:
+            if attempt == attempts:
+                raise
+            logger.warning(f"База недоступна ({e}), попытка {attempt}/{attempts}")
+            await asyncio.sleep(2 ** attempt)
+    # Несколько экземпляров бота могут стартовать одновременно
+    async with transaction() as conn:
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext('laba5_schema'))")
+        await conn.execute(SCHEMA)
+    logger.info(f"Пул соединений создан (min={min_size}, max={max_size})")
+    return pool
+
+
+async def close_pool():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+        logger.info("Пул соединений закрыт")
+
+
+@asynccontextmanager
+async def acquire():
+    # async with db.acquire() as conn: ... (время считается с ожиданием пула)
+    if pool is None:
+        raise RuntimeError("Пул соединений не инициализирован")
+    start = time.perf_counter()
+    try:
+        async with pool.acquire(timeout=acquire_timeout) as conn:
+            yield conn
+    finally:
+        elapsed = time.perf_counter() - start
+        for listener in timing_listeners:
+            listener(elapsed)
+
+
+@asynccontextmanager
+async def transaction():
+    # Несколько запросов в одной транзакции; ошибка откатывает только ее
+    async with acquire() as conn:
+        async with conn.transaction():
+            yield conn
+
+
+async def _run(method: str, query: str, *args):
+    # Один запрос - одна транзакция. При обрыве соединения повторяем на новом,
+    # если запрос не успел уйти в базу (ошибка при получении соединения) или
+    # только читает: INSERT/UPDATE мог уже закоммититься, и повтор его задвоит.
+    read_only = _is_read_only(query)
+    for attempt in range(DB_RETRIES + 1):
+        sent = False
+        try:
+            async with acquire() as conn:
+                sent = True
+                return await getattr(conn, method)(query, *args)
+        except CONNECTION_ERRORS as e:
+            if attempt == DB_RETRIES or (sent and not read_only):
+                raise
+            logger.warning(f"Соединение с базой потеряно ({e}), повтор запроса")
+            await asyncio.sleep(0.1 * 2 ** attempt)
+
+
+def _is_read_only(query: str) -> bool:
+    return query.lstrip().split(None, 1)[0].upper() == 'SELECT'
+
+
+async def fetch(query: str, *args) -> list:
+    return await _run('fetch', query, *args)
+
+
+async def fetchrow(query: str, *args):
+    return await _run('fetchrow', query, *args)
+
+
+async def fetchval(query: str, *args):
+    return await _run('fetchval', query, *args)
+
+
+async def execute(query: str, *args) -> str:
+    return await _run('execute', query, *args)
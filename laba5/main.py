@@ -1,7 +1,10 @@
 import asyncio
-import psycopg2
+import asyncpg
+import math
+from decimal import Decimal, InvalidOperation
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -9,18 +12,32 @@ from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, BotComma
 from dotenv import load_dotenv
 import os
 import logging
-
-# Настройка подключения к БД и загрузка токена
+from bot_metrics import BotMetrics
+import profiler
+import db
+from currencies import CurrencyTable
+from changes import ChangeFeed
+from admins import AdminSet
+
+# Загрузка токена (настройки БД - в db.py)
 load_dotenv()
-conn = psycopg2.connect(
-    dbname=os.getenv('DB_NAME', 'postgres'),
-    user=os.getenv('DB_USER', 'postgres'),
-    password=os.getenv('DB_PASSWORD', 'postgres'),
-    host=os.getenv('DB_HOST', 'localhost'),
-    port=os.getenv('DB_PORT', '5433'),
-    client_encoding='utf-8'
-)
 API_TOKEN = os.getenv("API_TOKEN")
+# Сводка метрик в лог (секунды, 0 - не писать) и локальный /metrics (порт)
+BOT_METRICS_SUMMARY_INTERVAL = float(os.getenv('BOT_METRICS_SUMMARY_INTERVAL', '300'))
+BOT_METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', '0'))
+# Профилирование: /profile [секунды] для админов или сигнал SIGUSR1
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', '30'))
+PROFILE_MAX_SECONDS = 300
+# Сколько запросов set_my_commands отправлять одновременно
+MENU_CONCURRENCY = int(os.getenv('MENU_CONCURRENCY', '5'))
+MENU_RETRIES = 3
+# Сколько строк «сумма валюта» можно конвертировать одним сообщением
+MAX_CONVERT_LINES = 100
+# Ограничения строки, чтобы ответ оставался читаемым
+MAX_CONVERT_AMOUNT = 1e12
+MAX_CURRENCY_LENGTH = 10
+TELEGRAM_MESSAGE_LIMIT = 4096
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +46,27 @@ logger = logging.getLogger(__name__)
 # Инициализация бота
 bot = Bot(token=API_TOKEN)
 dp = Dispatcher(storage=MemoryStorage())
+bot_metrics = BotMetrics()
+bot_metrics.setup(dp, bot)
+db.timing_listeners.append(lambda elapsed: bot_metrics.observe_dependency('db', 'postgres', elapsed))
+currency_table = CurrencyTable()
+# Изменения таблиц от других экземпляров бота и ручных правок в базе
+change_feed = ChangeFeed()
+admin_set = AdminSet()
+change_feed.on('currencies', currency_table.apply_change)
+change_feed.on('admins', admin_set.apply_change)
+change_feed.resync.append(currency_table.load)
+change_feed.resync.append(admin_set.load)
+
+def parse_rate(text: str) -> Decimal:
+    # Decimal, а не float: NUMERIC хранит ровно введенное значение
+    try:
+        rate = Decimal(text.strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"некорректный курс: {text}")
+    if not rate.is_finite() or rate <= 0:
+        raise ValueError(f"некорректный курс: {text}")
+    return rate
 
 # Состояния FSM
 class AddCurrencyStep(StatesGroup):
@@ -50,33 +88,54 @@ class AddAdminStep(StatesGroup):
     chat_id = State()
 
 # Проверка администратора
-async def is_admin(chat_id: int) -> bool:
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM admins WHERE chat_id = %s", (str(chat_id),))
-    return cursor.fetchone() is not None
+def is_admin(chat_id: int) -> bool:
+    return chat_id in admin_set
 
 # Настройка меню команд
-async def setup_commands(bot: Bot):
-    user_commands = [
-        BotCommand(command="start", description="Начало работы"),
-        BotCommand(command="get_currencies", description="Список валют"),
-        BotCommand(command="convert", description="Конвертация валюты")
-    ]
-    admin_commands = user_commands + [
-        BotCommand(command="manage_currency", description="Управление валютами"),
-        BotCommand(command="add_admin", description="Добавить администратора")
-    ]
-    
-    await bot.set_my_commands(commands=user_commands)
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT chat_id FROM admins")
-    admins = cursor.fetchall()
-    for admin in admins:
+USER_COMMANDS = [
+    BotCommand(command="start", description="Начало работы"),
+    BotCommand(command="get_currencies", description="Список валют"),
+    BotCommand(command="convert", description="Конвертация валюты")
+]
+ADMIN_COMMANDS = USER_COMMANDS + [
+    BotCommand(command="manage_currency", description="Управление валютами"),
+    BotCommand(command="add_admin", description="Добавить администратора")
+]
+
+# Время цикла событий, до которого Telegram просил не слать запросы (429)
+menu_retry_at = 0.0
+
+async def set_commands(bot: Bot, commands, scope=None) -> bool:
+    global menu_retry_at
+    loop = asyncio.get_running_loop()
+    for attempt in range(MENU_RETRIES):
+        # Пауза после 429 общая для всех одновременных запросов
+        delay = menu_retry_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
         try:
-            await bot.set_my_commands(commands=admin_commands, scope=types.BotCommandScopeChat(chat_id=int(admin[0])))
+            await bot.set_my_commands(commands=commands, scope=scope)
+            return True
+        except TelegramRetryAfter as e:
+            menu_retry_at = max(menu_retry_at, loop.time() + e.retry_after)
+            logger.warning(f"Лимит Telegram, повтор через {e.retry_after} сек")
         except Exception as e:
-            logger.error(f"Failed to set commands for admin {admin[0]}: {e}")
+            logger.error(f"Failed to set commands for {scope}: {e}")
+            return False
+    return False
+
+async def setup_admin_menus(bot: Bot, chat_ids):
+    semaphore = asyncio.Semaphore(MENU_CONCURRENCY)
+
+    async def push(chat_id):
+        async with semaphore:
+            await set_commands(bot, ADMIN_COMMANDS, types.BotCommandScopeChat(chat_id=int(chat_id)))
+
+    await asyncio.gather(*(push(chat_id) for chat_id in chat_ids))
+
+async def setup_commands(bot: Bot):
+    await set_commands(bot, USER_COMMANDS)
+    await setup_admin_menus(bot, admin_set)
 
 # Команда /start
 @dp.message(Command("start"))
@@ -86,7 +145,7 @@ async def start(message: Message):
         "/convert - конвертировать валюту"
     ]
     
-    if await is_admin(message.chat.id):
+    if is_admin(message.chat.id):
         commands_list.append("/manage_currency - управление валютами (только для админов)")
         commands_list.append("/add_admin - добавить администратора")
     
@@ -113,20 +172,18 @@ async def add_admin_chat_id(message: Message, state: FSMContext):
         await message.answer("Некорректный chat_id. Введите число.")
         return
 
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO admins (chat_id) VALUES (%s)", (str(chat_id),))
-        conn.commit()
+        await admin_set.add(chat_id)
         await message.answer(f"Пользователь {chat_id} добавлен в админы.")
-        await setup_commands(bot)  # Обновляем меню команд
-    except psycopg2.errors.UniqueViolation:
+        await setup_admin_menus(bot, [chat_id])  # Меню только нового админа
+    except asyncpg.UniqueViolationError:
         await message.answer("Этот пользователь уже является админом.")
     await state.clear()
 
 # Команда /manage_currency (только для админов)
 @dp.message(Command("manage_currency"))
 async def manage_currency(message: Message):
-    if not await is_admin(message.chat.id):
+    if not is_admin(message.chat.id):
         await message.answer("Нет доступа к команде")
         return
 
@@ -142,7 +199,7 @@ async def manage_currency(message: Message):
 # Добавление валюты
 @dp.message(F.text == "Добавить валюту")
 async def add_currency(message: Message, state: FSMContext):
-    if not await is_admin(message.chat.id):
+    if not is_admin(message.chat.id):
         await message.answer("Нет доступа")
         return
         
@@ -152,10 +209,8 @@ async def add_currency(message: Message, state: FSMContext):
 @dp.message(AddCurrencyStep.name)
 async def add_currency_name(message: Message, state: FSMContext):
     currency_name = message.text.strip().upper()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM currencies WHERE currency_name = %s", (currency_name,))
     
-    if cursor.fetchone() is not None:
+    if currency_name in currency_table:
         await message.answer("Данная валюта уже существует")
         await state.clear()
         return
@@ -167,9 +222,7 @@ async def add_currency_name(message: Message, state: FSMContext):
 @dp.message(AddCurrencyStep.rate)
 async def add_rate_step(message: Message, state: FSMContext):
     try:
-        rate = float(message.text.strip().replace(",", "."))
-        if rate <= 0:
-            raise ValueError
+        rate = parse_rate(message.text)
     except ValueError:
         await message.answer("Некорректный формат курса. Введите положительное число")
         return
@@ -177,9 +230,12 @@ async def add_rate_step(message: Message, state: FSMContext):
     data = await state.get_data()
     currency_name = data.get('currency_name')
     
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO currencies (currency_name, rate) VALUES (%s, %s)", (currency_name, rate))
-    conn.commit()
+    try:
+        await currency_table.add(currency_name, rate)
+    except asyncpg.UniqueViolationError:
+        await message.answer("Данная валюта уже существует")
+        await state.clear()
+        return
     
     await message.answer(f"Валюта {currency_name} успешно добавлена с курсом {rate}")
     await state.clear()
@@ -187,7 +243,7 @@ async def add_rate_step(message: Message, state: FSMContext):
 # Удаление валюты
 @dp.message(F.text == "Удалить валюту")
 async def delete_currency(message: Message, state: FSMContext):
-    if not await is_admin(message.chat.id):
+    if not is_admin(message.chat.id):
         await message.answer("Нет доступа")
         return
         
@@ -197,23 +253,18 @@ async def delete_currency(message: Message, state: FSMContext):
 @dp.message(DeleteCurrencyStep.name)
 async def delete_currency_name(message: Message, state: FSMContext):
     currency_name = message.text.strip().upper()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM currencies WHERE currency_name = %s", (currency_name,))
-    if cursor.fetchone() is None:
+    if not await currency_table.delete(currency_name):
         await message.answer(f"Валюта {currency_name} не найдена")
         await state.clear()
         return
     
-    cursor.execute("DELETE FROM currencies WHERE currency_name = %s", (currency_name,))
-    conn.commit()
     await message.answer(f"Валюта {currency_name} успешно удалена")
     await state.clear()
 
 # Изменение курса валюты
 @dp.message(F.text == "Изменить курс валюты")
 async def change_rate(message: Message, state: FSMContext):
-    if not await is_admin(message.chat.id):
+    if not is_admin(message.chat.id):
         await message.answer("Нет доступа")
         return
         
@@ -223,10 +274,7 @@ async def change_rate(message: Message, state: FSMContext):
 @dp.message(ChangeRateStep.name)
 async def change_rate_name(message: Message, state: FSMContext):
     currency_name = message.text.strip().upper()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM currencies WHERE currency_name = %s", (currency_name,))
-    if cursor.fetchone() is None:
+    if currency_name not in currency_table:
         await message.answer(f"Валюта {currency_name} не найдена")
         await state.clear()
         return
@@ -238,9 +286,7 @@ async def change_rate_name(message: Message, state: FSMContext):
 @dp.message(ChangeRateStep.rate)
 async def change_rate_value(message: Message, state: FSMContext):
     try:
-        rate = float(message.text.strip().replace(",", "."))
-        if rate <= 0:
-            raise ValueError
+        rate = parse_rate(message.text)
     except ValueError:
         await message.answer("Некорректный формат курса. Введите положительное число")
         return
@@ -248,9 +294,10 @@ async def change_rate_value(message: Message, state: FSMContext):
     data = await state.get_data()
     currency_name = data.get('currency_name')
     
-    cursor = conn.cursor()
-    cursor.execute("UPDATE currencies SET rate = %s WHERE currency_name = %s", (rate, currency_name))
-    conn.commit()
+    if await currency_table.set_rate(currency_name, rate) is None:
+        await message.answer(f"Валюта {currency_name} не найдена")
+        await state.clear()
+        return
     
     await message.answer(f"Курс валюты {currency_name} успешно изменен на {rate}")
     await state.clear()
@@ -258,37 +305,82 @@ async def change_rate_value(message: Message, state: FSMContext):
 # Команда /get_currencies
 @dp.message(Command("get_currencies"))
 async def get_currencies(message: Message):
-    cursor = conn.cursor()
-    cursor.execute("SELECT currency_name, rate FROM currencies ORDER BY currency_name")
-    currencies = cursor.fetchall()
-    
-    if not currencies:
-        await message.answer("В базе данных нет сохраненных валют")
-        return
-    
-    response = "Текущие курсы валют к рублю:\n\n"
-    response += "\n".join([f"{curr[0]}: {curr[1]}" for curr in currencies])
-    await message.answer(response)
+    await message.answer(currency_table.render())
 
 # Команда /convert
 @dp.message(Command("convert"))
-async def convert_currency(message: Message, state: FSMContext):
+async def convert_currency(message: Message, state: FSMContext, command: CommandObject):
+    # "/convert 100 USD" или несколько строк - сразу, без диалога
+    if command.args:
+        await answer_conversions(message, command.args)
+        return
     await message.answer("Введите название валюты:")
     await state.set_state(ConvertCurrencyStep.name)
 
+def parse_conversions(text: str) -> list[tuple[float, str]]:
+    # Строки вида «100 USD»; ValueError с номером неверной строки
+    items = []
+    for number, line in enumerate(text.splitlines(), 1):
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            amount, currency_name = parts
+            amount = float(amount.replace(",", "."))
+            if not (math.isfinite(amount) and amount > 0):
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Строка {number}: ожидается «сумма валюта», например 100 USD")
+        if amount > MAX_CONVERT_AMOUNT:
+            raise ValueError(f"Строка {number}: сумма должна быть от 0 до {MAX_CONVERT_AMOUNT:g}")
+        if len(currency_name) > MAX_CURRENCY_LENGTH:
+            raise ValueError(f"Строка {number}: код валюты не длиннее {MAX_CURRENCY_LENGTH} символов")
+        items.append((amount, currency_name.upper()))
+    if len(items) > MAX_CONVERT_LINES:
+        raise ValueError(f"Не больше {MAX_CONVERT_LINES} строк за раз")
+    return items
+
+async def answer_conversions(message: Message, text: str):
+    try:
+        items = parse_conversions(text)
+    except ValueError as e:
+        await message.answer(str(e))
+        return
+    # Все курсы - одним чтением таблицы в памяти
+    rates = currency_table.get_many(currency_name for _, currency_name in items)
+    lines = []
+    for amount, currency_name in items:
+        rate = rates.get(currency_name)
+        if rate is None:
+            lines.append(f"{amount} {currency_name}: валюта не найдена")
+        else:
+            lines.append(f"{amount} {currency_name} = {amount * float(rate):.2f} рублей")
+    await answer_lines(message, lines)
+
+async def answer_lines(message: Message, lines: list[str]):
+    # Длинный ответ - несколькими сообщениями по границам строк
+    chunk, size = [], 0
+    for line in lines:
+        line = line[:TELEGRAM_MESSAGE_LIMIT]
+        if chunk and size + len(line) + 1 > TELEGRAM_MESSAGE_LIMIT:
+            await message.answer("\n".join(chunk))
+            chunk, size = [], 0
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        await message.answer("\n".join(chunk))
+
 @dp.message(ConvertCurrencyStep.name)
 async def convert_currency_name(message: Message, state: FSMContext):
     currency_name = message.text.strip().upper()
-    cursor = conn.cursor()
-    cursor.execute("SELECT rate FROM currencies WHERE currency_name = %s", (currency_name,))
-    currency = cursor.fetchone()
+    rate = currency_table.get(currency_name)
     
-    if not currency:
+    if rate is None:
         await message.answer(f"Валюта {currency_name} не найдена")
         await state.clear()
         return
     
-    await state.update_data(currency_name=currency_name, rate=currency[0])
+    await state.update_data(currency_name=currency_name, rate=float(rate))
     await message.answer("Введите сумму для конвертации:")
     await state.set_state(ConvertCurrencyStep.amount)
 
@@ -310,6 +402,33 @@ async def convert_amount_step(message: Message, state: FSMContext):
     await message.answer(f"{amount} {currency_name} = {converted_amount:.2f} рублей")
     await state.clear()
 
+# Команда /profile (только для админов)
+@dp.message(Command("profile"))
+async def profile_bot(message: Message, command: CommandObject):
+    if not is_admin(message.chat.id):
+        await message.answer("Нет доступа к команде")
+        return
+    try:
+        seconds = float(command.args) if command.args else PROFILE_SECONDS
+    except ValueError:
+        await message.answer("Использование: /profile [секунды]")
+        return
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+
+    await message.answer(f"Профилирую {seconds:g} сек...")
+    try:
+        path, summary = await profiler.profile(seconds, PROFILE_DIR)
+    except RuntimeError as e:
+        await message.answer(str(e))
+        return
+    await message.answer_document(types.FSInputFile(path), caption="Collapsed stacks для flamegraph")
+    await message.answer("\n".join(summary)[:4096])
+
+# Сообщение из строк «сумма валюта» вне диалога - конвертация сразу
+@dp.message(StateFilter(None), F.text.regexp(r"^\s*\d"))
+async def convert_lines(message: Message):
+    await answer_conversions(message, message.text)
+
 # Обработка неизвестных сообщений
 @dp.message()
 async def unknown_command(message: Message):
@@ -317,11 +436,23 @@ async def unknown_command(message: Message):
 
 # Запуск бота
 async def on_startup(bot: Bot):
+    await db.create_pool()
+    await currency_table.load()
+    await admin_set.load()
+    await change_feed.start()
     await setup_commands(bot)
+    await bot_metrics.start(BOT_METRICS_SUMMARY_INTERVAL, BOT_METRICS_PORT)
+    profiler.install_signal_handler(PROFILE_SECONDS, PROFILE_DIR)
     logger.info("Бот запущен")
 
+async def on_shutdown():
+    await bot_metrics.stop()
+    await change_feed.stop()
+    await db.close_pool()
+
 async def main():
     dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
     await dp.start_polling(bot)
 
 if __name__ == '__main__':
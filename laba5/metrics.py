@@ -0,0 +1,143 @@
+# Метрики в памяти процесса и их вывод в текстовом формате Prometheus.
+# Значения хранятся в словарях по кортежу меток; обновление - одна
+# операция под общей блокировкой, гистограммы - фиксированные границы и
+# bisect, так что учет запроса стоит единицы микросекунд.
+#
+# Правится в rgz/metrics.py и копируется в laba4 и laba5 (каждая
+# лабораторная запускается из своей папки); rgz/test_shared_copies.py
+# падает, если копии разошлись.
+import threading
+from bisect import bisect_left
+
+# Границы гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labels=(), lock=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = lock or threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self) -> dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS, lock=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = lock or threading.Lock()
+        # метки -> [счетчики по границам (+ последний для +Inf), сумма]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def snapshot(self) -> dict[tuple, tuple[list, float]]:
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+
+    def samples(self):
+        for labels, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else _format_value(bound)
+                yield f"{self.name}_bucket", _format_labels(self.labels, labels, [('le', le)]), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labels, labels), total
+            yield f"{self.name}_count", _format_labels(self.labels, labels), cumulative
+
+
+def quantile(counts: list, buckets: tuple, q: float) -> float | None:
+    # Оценка квантиля по гистограмме: верхняя граница корзины, где он лежит
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for bound, count in zip((*buckets, float('inf')), counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return float('inf')
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels, self._lock))
+
+    def gauge(self, name: str, help: str, labels=()) -> Gauge:
+        return self._add(Gauge(name, help, labels, self._lock))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets, self._lock))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
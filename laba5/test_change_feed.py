@@ -0,0 +1,163 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+import db
+from changes import ChangeFeed
+from currencies import CurrencyTable
+from admins import AdminSet
+
+try:
+    import pgserver
+except ImportError:
+    pgserver = None
+
+
+# Тест поднимает одноразовый Postgres через pgserver (pip install pgserver)
+# или использует базу из LABA5_TEST_DB_HOST/PORT/USER/PASSWORD/NAME
+def throwaway_config(tmpdir):
+    if os.getenv('LABA5_TEST_DB_HOST'):
+        return {
+            'host': os.getenv('LABA5_TEST_DB_HOST'),
+            'port': int(os.getenv('LABA5_TEST_DB_PORT', '5432')),
+            'user': os.getenv('LABA5_TEST_DB_USER', 'postgres'),
+            'password': os.getenv('LABA5_TEST_DB_PASSWORD', 'postgres'),
+            'database': os.getenv('LABA5_TEST_DB_NAME', 'postgres'),
+        }, None
+    if pgserver is None:
+        return None, None
+    server = pgserver.get_server(tmpdir, cleanup_mode='delete')
+    return {'host': tmpdir, 'user': 'postgres', 'database': 'postgres'}, server
+
+
+async def wait_until(condition, timeout=2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("изменение не пришло")
+        await asyncio.sleep(0.01)
+
+
+class TestChangeFeed(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp(prefix='laba5-pg-')
+        cls.config, cls.server = throwaway_config(cls.tmpdir)
+        if cls.config is None:
+            raise unittest.SkipTest("нет pgserver и LABA5_TEST_DB_HOST")
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.server is not None:
+            cls.server.cleanup()
+
+    async def asyncSetUp(self):
+        await db.create_pool(self.config, min_size=1, max_size=2)
+        await db.execute("TRUNCATE currencies, admins")
+        self.table = CurrencyTable()
+        await self.table.load()
+        self.feed = ChangeFeed(self.config, retry_delay=0.05)
+        self.feed.on('currencies', self.table.apply_change)
+        self.feed.resync.append(self.table.load)
+        await self.feed.start()
+        await asyncio.wait_for(self.feed.connected.wait(), 5)
+
+    async def asyncTearDown(self):
+        await self.feed.stop()
+        await db.close_pool()
+
+    async def test_direct_edits_reach_cache(self):
+        # Правки мимо бота (другой экземпляр, psql) попадают в кэш
+        await db.execute("INSERT INTO currencies (currency_name, rate) VALUES ('USD', 75.5)")
+        await wait_until(lambda: self.table.get('USD') == Decimal('75.5'))
+
+        await db.execute("UPDATE currencies SET rate = 80.125 WHERE currency_name = 'USD'")
+        await wait_until(lambda: self.table.get('USD') == Decimal('80.125'))
+        self.assertIn("USD: 80.125", self.table.render())
+
+        await db.execute("UPDATE currencies SET currency_name = 'EUR' WHERE currency_name = 'USD'")
+        await wait_until(lambda: 'EUR' in self.table)
+        self.assertNotIn('USD', self.table)
+
+        await db.execute("DELETE FROM currencies WHERE currency_name = 'EUR'")
+        await wait_until(lambda: 'EUR' not in self.table)
+
+    async def test_write_through_keeps_exact_rate(self):
+        # Decimal уходит в NUMERIC без двоичного хвоста float
+        self.assertEqual(await self.table.add('USD', Decimal('85.2')), Decimal('85.2'))
+        self.assertEqual(await self.table.set_rate('USD', Decimal('90.1')), Decimal('90.1'))
+        self.assertIn("USD: 90.1\n", self.table.render() + "\n")
+        self.assertEqual(await db.fetchval("SELECT rate::text FROM currencies"), '90.1')
+
+    async def test_truncate_clears_cache(self):
+        await db.execute("INSERT INTO currencies (currency_name, rate) VALUES ('USD', 75.5), ('EUR', 85)")
+        await wait_until(lambda: 'EUR' in self.table)
+        await db.execute("TRUNCATE currencies")
+        await wait_until(lambda: self.table.get('USD') is None and self.table.get('EUR') is None)
+
+    async def test_resync_after_reconnect(self):
+        # Изменения за время обрыва подхватываются перечитыванием таблицы
+        async with db.acquire() as conn:
+            terminated = await conn.fetchval("""
+                SELECT count(pg_terminate_backend(pid)) FROM pg_stat_activity
+                WHERE pid <> pg_backend_pid() AND query LIKE 'LISTEN%'
+            """)
+            self.assertEqual(terminated, 1)
+            await conn.execute("INSERT INTO currencies (currency_name, rate) VALUES ('CNY', 10.5)")
+        await wait_until(lambda: self.table.get('CNY') == Decimal('10.5'), timeout=5)
+
+    async def test_changes_during_resync_are_not_lost(self):
+        # Изменение, пришедшее пока идет перечитывание, применяется после него
+        await db.execute("INSERT INTO currencies (currency_name, rate) VALUES ('USD', 75.5)")
+        await wait_until(lambda: 'USD' in self.table)
+        await self.feed.stop()
+
+        async def reload_with_concurrent_change():
+            await self.table.load()
+            await db.execute("UPDATE currencies SET rate = 99 WHERE currency_name = 'USD'")
+            await asyncio.sleep(0.2)
+            self.assertEqual(self.table.get('USD'), Decimal('75.5'))
+
+        self.feed.resync[:] = [reload_with_concurrent_change]
+        self.feed.connected.clear()
+        await self.feed.start()
+        await asyncio.wait_for(self.feed.connected.wait(), 5)
+        self.assertEqual(self.table.get('USD'), Decimal('99'))
+
+    async def test_keepalive_detects_dead_listener(self):
+        # Живое соединение проверку проходит, зависшее - бросается
+        feed = ChangeFeed(self.config, keepalive_interval=0.02, keepalive_timeout=0.05)
+        async with db.acquire() as conn:
+            watch = asyncio.create_task(feed._watch(conn, asyncio.Event()))
+            await asyncio.sleep(0.2)
+            self.assertFalse(watch.done())
+            watch.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await watch
+
+        class HangingConnection:
+            async def fetchval(self, query, timeout):
+                await asyncio.sleep(timeout)
+                raise asyncio.TimeoutError
+
+        await asyncio.wait_for(feed._watch(HangingConnection(), asyncio.Event()), 1)
+
+
+class TestAdminSet(unittest.TestCase):
+    def test_chat_id_representation_does_not_matter(self):
+        # chat_id из уведомления может прийти числом или строкой
+        admins = AdminSet()
+        admins.apply_change({'table': 'admins', 'op': 'INSERT', 'old': None, 'new': {'chat_id': 123}})
+        admins.apply_change({'table': 'admins', 'op': 'INSERT', 'old': None, 'new': {'chat_id': '456'}})
+        self.assertIn(123, admins)
+        self.assertIn('123', admins)
+        self.assertIn(456, admins)
+        admins.apply_change({'table': 'admins', 'op': 'DELETE', 'old': {'chat_id': '123'}, 'new': None})
+        self.assertNotIn(123, admins)
+        self.assertEqual(list(admins), ['456'])
+
+
+if __name__ == '__main__':
+    unittest.main()
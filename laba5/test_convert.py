@@ -0,0 +1,75 @@
+import os
+import unittest
+from decimal import Decimal
+
+# main.py создает Bot при импорте - нужен токен правильного формата
+os.environ.setdefault('API_TOKEN', '1:test')
+
+import main
+from main import parse_conversions
+
+
+class FakeMessage:
+    def __init__(self):
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+class TestParseConversions(unittest.TestCase):
+    def test_valid_lines(self):
+        self.assertEqual(
+            parse_conversions("100 USD\n 50,5 eur \n3000\tKZT"),
+            [(100.0, 'USD'), (50.5, 'EUR'), (3000.0, 'KZT')]
+        )
+
+    def test_blank_lines_are_skipped(self):
+        self.assertEqual(parse_conversions("\n100 USD\n\n   \n1 EUR\n"), [(100.0, 'USD'), (1.0, 'EUR')])
+        self.assertEqual(parse_conversions(""), [])
+
+    def test_malformed_lines_name_the_line(self):
+        for text in ["100 USD\nabc USD", "100 USD\n-5 USD", "100 USD\n0 USD", "100 USD\nnan USD",
+                     "100 USD\ninf USD", "100 USD\n100", "100 USD\n1 2 3"]:
+            with self.subTest(text=text), self.assertRaisesRegex(ValueError, "Строка 2"):
+                parse_conversions(text)
+
+    def test_limits(self):
+        with self.assertRaisesRegex(ValueError, "Строка 1: сумма"):
+            parse_conversions(f"{main.MAX_CONVERT_AMOUNT * 10} USD")
+        with self.assertRaisesRegex(ValueError, "Строка 1: код валюты"):
+            parse_conversions("1 " + "X" * (main.MAX_CURRENCY_LENGTH + 1))
+        with self.assertRaisesRegex(ValueError, "строк за раз"):
+            parse_conversions("1 USD\n" * (main.MAX_CONVERT_LINES + 1))
+
+
+class TestAnswerConversions(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.saved_rates = main.currency_table._rates
+        main.currency_table._rates = {'USD': Decimal('90.5')}
+
+    def tearDown(self):
+        main.currency_table._rates = self.saved_rates
+
+    async def test_known_and_unknown_currencies(self):
+        message = FakeMessage()
+        await main.answer_conversions(message, "2 USD\n5 XXX")
+        self.assertEqual(message.answers, ["2.0 USD = 181.00 рублей\n5.0 XXX: валюта не найдена"])
+
+    async def test_parse_error_is_reported(self):
+        message = FakeMessage()
+        await main.answer_conversions(message, "2 USD\nmany USD")
+        self.assertEqual(len(message.answers), 1)
+        self.assertIn("Строка 2", message.answers[0])
+
+    async def test_long_reply_is_split(self):
+        main.currency_table._rates = {'USD': Decimal('1e250')}
+        message = FakeMessage()
+        await main.answer_conversions(message, "999999999999 USD\n" * main.MAX_CONVERT_LINES)
+        self.assertGreater(len(message.answers), 1)
+        self.assertTrue(all(len(answer) <= main.TELEGRAM_MESSAGE_LIMIT for answer in message.answers))
+        self.assertEqual(sum(answer.count("\n") + 1 for answer in message.answers), main.MAX_CONVERT_LINES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import db
+
+
+class FlakyConnection:
+    # Первые failures вызовов падают с обрывом соединения
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = []
+
+    async def fetchval(self, query, *args):
+        self.calls.append(query)
+        if len(self.calls) <= self.failures:
+            raise ConnectionResetError("connection reset")
+        return 1
+
+
+class TestRetries(unittest.IsolatedAsyncioTestCase):
+    def patch_acquire(self, conn, acquire_failures: int = 0):
+        attempts = []
+
+        @asynccontextmanager
+        async def acquire():
+            attempts.append(1)
+            if len(attempts) <= acquire_failures:
+                raise OSError("connection refused")
+            yield conn
+
+        patcher = mock.patch.multiple(db, acquire=acquire, DB_RETRIES=2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return attempts
+
+    async def test_read_only_query_is_retried(self):
+        conn = FlakyConnection(failures=2)
+        self.patch_acquire(conn)
+        self.assertEqual(await db.fetchval("SELECT 1"), 1)
+        self.assertEqual(len(conn.calls), 3)
+
+    async def test_write_is_not_retried_after_it_was_sent(self):
+        # INSERT мог закоммититься до обрыва - повтор задвоил бы строку
+        conn = FlakyConnection(failures=1)
+        self.patch_acquire(conn)
+        with self.assertRaises(ConnectionResetError):
+            await db.fetchval("INSERT INTO currencies (currency_name, rate) VALUES ($1, $2) RETURNING rate", 'USD', 1)
+        self.assertEqual(len(conn.calls), 1)
+
+    async def test_write_is_retried_when_connection_was_not_acquired(self):
+        conn = FlakyConnection(failures=0)
+        attempts = self.patch_acquire(conn, acquire_failures=2)
+        self.assertEqual(await db.fetchval("  insert into admins (chat_id) values ($1)", '1'), 1)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(len(conn.calls), 1)
+
+    async def test_gives_up_after_retries(self):
+        conn = FlakyConnection(failures=10)
+        self.patch_acquire(conn)
+        with self.assertRaises(ConnectionResetError):
+            await db.fetchval("SELECT 1")
+        self.assertEqual(len(conn.calls), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Бенчмарк отчета /operations: три запроса за весь месяц (старый вариант)
+# против одного запроса первой страницы.
+# Тестовые данные вставляются в транзакции, которая в конце откатывается.
+#
+#   python bench_report.py --operations 5000 --runs 50
+#
+# Время страницы не зависит от числа операций в месяце (читается не больше
+# PAGE_SIZE + 1 строк), плюс экономия двух round trip-ов на каждый отчет.
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import asyncpg
+
+from db import DB_CONFIG
+from reports import fetch_report_page
+
+BENCH_CHAT_ID = -1
+
+
+async def legacy_report(conn, chat_id, month, rate):
+    budget = await conn.fetchrow(
+        "SELECT amount FROM budget WHERE chat_id = $1 AND month = $2",
+        chat_id, month,
+    )
+    operations = await conn.fetch(
+        """SELECT date, sum, type_operation
+        FROM operations
+        WHERE chat_id = $1
+        AND date >= $2
+        AND date < $2::date + INTERVAL '1 month'
+        ORDER BY date DESC""",
+        chat_id, month,
+    )
+    total = await conn.fetchval(
+        """SELECT COALESCE(SUM(sum), 0)
+        FROM operations
+        WHERE chat_id = $1
+        AND type_operation = 'РАСХОД'
+        AND date >= $2
+        AND date < $2::date + INTERVAL '1 month'""",
+        chat_id, month,
+    )
+    converted = [
+        (d, (Decimal(str(s)) / rate).quantize(Decimal("0.00")), t)
+        for d, s, t in operations
+    ]
+    return budget, converted, total
+
+
+async def measure(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+    tr = conn.transaction()
+    await tr.start()
+    try:
+        month = datetime.now().date().replace(day=1)
+        await conn.execute(
+            "INSERT INTO budget (chat_id, month, amount) VALUES ($1, $2, $3)",
+            BENCH_CHAT_ID, month, Decimal('100000')
+        )
+        await conn.executemany(
+            "INSERT INTO operations (date, sum, chat_id, type_operation) VALUES ($1, $2, $3, $4)",
+            [
+                (month + timedelta(days=i % 28), Decimal(i % 1000 + 1), BENCH_CHAT_ID,
+                 'РАСХОД' if i % 3 else 'ДОХОД')
+                for i in range(args.operations)
+            ]
+        )
+        await conn.execute(
+            """INSERT INTO monthly_totals (chat_id, month, type_operation, total)
+            SELECT chat_id, date_trunc('month', date)::date, type_operation, SUM(sum)
+            FROM operations WHERE chat_id = $1
+            GROUP BY 1, 2, 3""",
+            BENCH_CHAT_ID
+        )
+        rate = Decimal('75.50')
+
+        legacy = await measure(lambda: legacy_report(conn, BENCH_CHAT_ID, month, rate), args.runs)
+        single = await measure(lambda: fetch_report_page(conn, BENCH_CHAT_ID, month, rate), args.runs)
+
+        print(f"Операций в месяце: {args.operations}, прогонов: {args.runs}")
+        print(f"{'вариант':<12}{'запросов':>10}{'p50, мс':>10}{'p95, мс':>10}")
+        print(f"{'3 запроса':<12}{3:>10}{legacy[0]:>10.2f}{legacy[1]:>10.2f}")
+        print(f"{'страница':<12}{1:>10}{single[0]:>10.2f}{single[1]:>10.2f}")
+    finally:
+        await tr.rollback()
+        await conn.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+# Нагрузочный тест сервера курсов: для каждого адреса и уровня
+# одновременности в течение --duration секунд шлет запросы без пауз и
+# печатает запросы/сек, p50 и p99 задержки и число ошибок.
+#
+#   python flask_server.py                    # или gunicorn wsgi:app
+#   python bench_server.py --url http://localhost:5000 --concurrency 1 8 32 128
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+PATHS = ['/rate?currency=USD', '/rates', '/health']
+
+
+async def load(session, url, concurrency, duration):
+    timings = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    ok = response.status == 200
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # Таймаут под нагрузкой - ошибка запроса, а не конец прогона
+                ok = False
+            if ok:
+                timings.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    timings.sort()
+    if not timings:
+        return 0, 0, 0, errors
+    p50 = statistics.median(timings) * 1000
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)] * 1000
+    return len(timings) / elapsed, p50, p99, errors
+
+
+async def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default=os.getenv('FLASK_SERVER_URL', 'http://localhost:5000'))
+    parser.add_argument('--api-key', default=os.getenv('FLASK_API_KEY'))
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--paths', nargs='+', default=PATHS)
+    args = parser.parse_args()
+
+    headers = {'X-API-KEY': args.api_key} if args.api_key else None
+    print(f"Сервер: {args.url}, {args.duration:g} с на замер")
+    print(f"{'адрес':<22}{'потоков':>8}{'запр/сек':>10}{'p50, мс':>10}{'p99, мс':>10}{'ошибок':>8}")
+    for path in args.paths:
+        for concurrency in args.concurrency:
+            connector = aiohttp.TCPConnector(limit=concurrency)
+            async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+                rps, p50, p99, errors = await load(session, f"{args.url}{path}", concurrency, args.duration)
+            print(f"{path:<22}{concurrency:>8}{rps:>10.0f}{p50:>10.2f}{p99:>10.2f}{errors:>8}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+# Бенчмарк записи операций: транзакция на каждую операцию против пакетной
+# записи через OperationWriter. Операции пишутся под отдельным chat_id и
+# удаляются в конце.
+#
+#   python bench_writes.py --operations 5000 --concurrency 100
+import argparse
+import asyncio
+import time
+from datetime import date
+from decimal import Decimal
+
+import db
+import rollup
+from write_behind import OperationWriter
+
+BENCH_CHAT_ID = -2
+
+
+async def run_concurrently(func, operations, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await func(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(operations)))
+    return time.perf_counter() - start
+
+
+async def per_row(i):
+    async with db.acquire() as conn:
+        await rollup.record_operation(conn, BENCH_CHAT_ID, date(2026, 1, i % 28 + 1), Decimal('10.00'), 'РАСХОД')
+
+
+async def cleanup():
+    async with db.acquire() as conn:
+        await conn.execute("DELETE FROM operations WHERE chat_id = $1", BENCH_CHAT_ID)
+        await conn.execute("DELETE FROM monthly_totals WHERE chat_id = $1", BENCH_CHAT_ID)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--max-delay', type=float, default=0.005)
+    args = parser.parse_args()
+
+    await db.create_pool()
+    try:
+        await cleanup()
+        row_time = await run_concurrently(per_row, args.operations, args.concurrency)
+        await cleanup()
+
+        writer = OperationWriter(batch_size=args.batch_size, max_delay=args.max_delay)
+        writer.start()
+        batch_time = await run_concurrently(
+            lambda i: writer.submit(BENCH_CHAT_ID, date(2026, 1, i % 28 + 1), Decimal('10.00'), 'РАСХОД'),
+            args.operations, args.concurrency
+        )
+        await writer.stop()
+        await cleanup()
+    finally:
+        await db.close_pool()
+
+    print(f"Операций: {args.operations}, одновременно: {args.concurrency}")
+    print(f"{'вариант':<12}{'сек':>10}{'оп/сек':>12}")
+    print(f"{'по одной':<12}{row_time:>10.2f}{args.operations / row_time:>12.0f}")
+    print(f"{'пакетами':<12}{batch_time:>10.2f}{args.operations / batch_time:>12.0f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+# Пакетная конвертация сумм по одному снимку курсов (POST /convert).
+#
+# Курсы - рубли за единицу валюты, RUB = 1. Множитель для каждой пары
+# (из, в) считается один раз на запрос в Decimal, затем все суммы проходят
+# одним циклом: умножение и округление до копеек ROUND_HALF_UP, как ROUND
+# в отчетах.
+#
+# Двоичный формат (application/octet-stream), little-endian:
+#   запрос - записи по 14 байт: сумма в копейках (int64), из (3 байта ASCII),
+#   в (3 байта ASCII); ответ - int64 в копейках на каждую запись.
+#
+# Суммы и результаты ограничены диапазоном int64 в копейках в обоих
+# форматах; записи вне него - ConversionError с их номерами (HTTP 400).
+import struct
+from decimal import ROUND_DOWN, ROUND_HALF_UP, Decimal
+
+CENT = Decimal('0.01')
+BINARY_ITEM = struct.Struct('<q3s3s')
+BINARY_RESULT = struct.Struct('<q')
+MAX_AMOUNT = Decimal(2 ** 63 - 1).scaleb(-2).quantize(CENT, rounding=ROUND_DOWN)
+
+
+class ConversionError(ValueError):
+    def __init__(self, message: str, items: list):
+        super().__init__(message)
+        self.items = items
+
+
+def pair_factors(rates, pairs) -> dict[tuple[str, str], Decimal]:
+    # Множители кросс-курсов; неизвестные валюты - ConversionError
+    known = {currency: Decimal(str(rate)) for currency, rate in rates.items()}
+    known.setdefault('RUB', Decimal(1))
+    unknown = sorted({c for pair in pairs for c in pair if c not in known})
+    if unknown:
+        raise ConversionError('Invalid currency', unknown)
+    return {(src, dst): known[src] / known[dst] for src, dst in pairs}
+
+
+def convert(rates, amounts: list[Decimal], sources: list[str], targets: list[str]) -> list[Decimal]:
+    pairs = list(zip(sources, targets))
+    factors = pair_factors(rates, set(pairs))
+    results = []
+    out_of_range = []
+    for i, (amount, pair) in enumerate(zip(amounts, pairs)):
+        try:
+            result = (amount * factors[pair]).quantize(CENT, rounding=ROUND_HALF_UP)
+        except ArithmeticError:
+            # quantize не помещается в точность контекста
+            result = None
+        if result is None or abs(result) > MAX_AMOUNT:
+            out_of_range.append(i)
+        results.append(result)
+    if out_of_range:
+        raise ConversionError('Result out of range', out_of_range[:100])
+    return results
+
+
+def parse_json_items(items) -> tuple[list, list, list]:
+    # [{"amount": "100.50", "from": "USD", "to": "RUB"}, ...] или [["100.50", "USD", "RUB"], ...]
+    if not isinstance(items, list):
+        raise ConversionError('items must be a list', [])
+    amounts, sources, targets = [], [], []
+    invalid = []
+    for i, item in enumerate(items):
+        try:
+            if isinstance(item, dict):
+                amount, src, dst = item['amount'], item['from'], item['to']
+            else:
+                amount, src, dst = item
+            # Числа из JSON берем по их записи, без двоичной погрешности float
+            amount = Decimal(str(amount))
+            if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+                raise ValueError
+            amounts.append(amount)
+            sources.append(src.upper())
+            targets.append(dst.upper())
+        except (KeyError, TypeError, ValueError, ArithmeticError, AttributeError):
+            invalid.append(i)
+    if invalid:
+        raise ConversionError('Invalid items', invalid[:100])
+    return amounts, sources, targets
+
+
+def parse_binary_items(body: bytes) -> tuple[list, list, list]:
+    if len(body) % BINARY_ITEM.size:
+        raise ConversionError(f'body length must be a multiple of {BINARY_ITEM.size}', [])
+    amounts, sources, targets = [], [], []
+    for cents, src, dst in BINARY_ITEM.iter_unpack(body):
+        amounts.append(Decimal(cents).scaleb(-2))
+        sources.append(src.decode('ascii', 'replace').upper())
+        targets.append(dst.decode('ascii', 'replace').upper())
+    return amounts, sources, targets
+
+
+def pack_binary_results(results: list[Decimal]) -> bytes:
+    return b''.join(BINARY_RESULT.pack(int(result.scaleb(2))) for result in results)
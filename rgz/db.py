@@ -0,0 +1,63 @@
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+import asyncpg
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DB_CONFIG = {
+    "user": os.getenv('DB_USER', 'postgres'),
+    "password": os.getenv('DB_PASSWORD', 'postgres'),
+    "database": os.getenv('DB_NAME', 'postgres'),
+    "host": os.getenv('DB_HOST', 'localhost'),
+    "port": int(os.getenv('DB_PORT', '5433'))
+}
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+
+# Общий пул соединений, создается при старте диспетчера
+pool: asyncpg.Pool | None = None
+acquire_timeout: float = DB_POOL_TIMEOUT
+# Вызываются с длительностью каждого использования соединения (метрики бота)
+timing_listeners = []
+
+
+async def create_pool(config: dict = DB_CONFIG, min_size: int = DB_POOL_MIN_SIZE,
+                      max_size: int = DB_POOL_MAX_SIZE, timeout: float = DB_POOL_TIMEOUT):
+    global pool, acquire_timeout
+    acquire_timeout = timeout
+    pool = await asyncpg.create_pool(
+        min_size=min_size,
+        max_size=max_size,
+        **config
+    )
+    logger.info(f"Пул соединений создан (min={min_size}, max={max_size})")
+    return pool
+
+
+async def close_pool():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+        logger.info("Пул соединений закрыт")
+
+
+@asynccontextmanager
+async def acquire():
+    # async with db.acquire() as conn: ... (время считается с ожиданием пула)
+    if pool is None:
+        raise RuntimeError("Пул соединений не инициализирован")
+    start = time.perf_counter()
+    try:
+        async with pool.acquire(timeout=acquire_timeout) as conn:
+            yield conn
+    finally:
+        elapsed = time.perf_counter() - start
+        for listener in timing_listeners:
+            listener(elapsed)
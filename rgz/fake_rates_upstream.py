@@ -0,0 +1,48 @@
+# Локальный поддельный источник курсов для проверки HttpProvider:
+#
+#   python fake_rates_upstream.py --port 5050 --drift 0.5
+#   RATES_PROVIDER=http RATES_URL=http://localhost:5050/rates python flask_server.py
+#
+# Каждый запрос немного сдвигает курсы, чтобы было видно обновление снимков.
+import argparse
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+rates = {'USD': 75.50, 'EUR': 85.20, 'CNY': 10.40}
+
+
+class Handler(BaseHTTPRequestHandler):
+    drift = 0.0
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/rates':
+            self.send_error(404)
+            return
+        for currency in rates:
+            rates[currency] = round(max(0.01, rates[currency] + random.uniform(-self.drift, self.drift)), 4)
+        body = json.dumps({'rates': rates}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--drift', type=float, default=0.0)
+    args = parser.parse_args()
+
+    Handler.drift = args.drift
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    print(f"Поддельный источник курсов: http://127.0.0.1:{args.port}/rates")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,20 @@
-from flask import Flask, request, jsonify
+# Сервер курсов валют.
+#
+# Для разработки: python flask_server.py (FLASK_DEBUG=1 - с отладчиком).
+# В production - несколько процессов gunicorn с потоками (настройки в
+# gunicorn.conf.py): gunicorn wsgi:app
+from flask import Flask, Response, g, request, jsonify
 from datetime import datetime
+import json
 import logging
 import os
+import time
 from dotenv import load_dotenv
 from flask_cors import CORS
+from rate_providers import RateRefresher, provider_from_env, rates_version
+from rate_history import RateHistory
+import conversion
+import metrics
 
 app = Flask(__name__)
 CORS(app)
@@ -18,9 +29,8 @@ logger = logging.getLogger(__name__)
 # Загрузка переменных окружения
 load_dotenv()
 
-app = Flask(__name__)
-
-# Моковые данные курсов валют (в production заменить на реальный API)
+# Курсы по умолчанию: отдаются, пока провайдер не ответил, и используются
+# статическим провайдером (RATES_PROVIDER=static)
 CURRENCY_RATES = {
     'USD': 75.50,
     'EUR': 85.20,
@@ -29,23 +39,88 @@ CURRENCY_RATES = {
 # API-ключ для защиты (добавьте в .env)
 API_KEY = os.getenv('FLASK_API_KEY')
 
+# Сколько секунд клиент может не перезапрашивать /rates
+RATES_MAX_AGE = int(os.getenv('RATES_MAX_AGE', '60'))
+
+# Сколько сумм можно конвертировать одним запросом POST /convert
+CONVERT_MAX_ITEMS = int(os.getenv('CONVERT_MAX_ITEMS', '100000'))
+
+# Интервал пустых сообщений в /rates/stream, чтобы прокси не рвали соединение
+RATES_STREAM_HEARTBEAT = float(os.getenv('RATES_STREAM_HEARTBEAT', '15'))
+
+# Источник курсов (RATES_PROVIDER=static|file|http) и период обновления
+RATES_REFRESH_INTERVAL = float(os.getenv('RATES_REFRESH_INTERVAL', '60'))
+rate_refresher = RateRefresher(
+    provider_from_env(os.environ, CURRENCY_RATES),
+    interval=RATES_REFRESH_INTERVAL,
+    initial=CURRENCY_RATES
+)
+# История курсов по дням (RATES_HISTORY_FILE - где хранить между запусками)
+rate_history = RateHistory(os.getenv('RATES_HISTORY_FILE'))
+rate_refresher.listeners.append(rate_history.record)
+rate_refresher.start()
+rate_history.record(rate_refresher.snapshot)
+
+# Метрики запросов (/metrics). У каждого процесса gunicorn они свои.
+registry = metrics.Registry()
+requests_total = registry.counter(
+    'rate_server_requests_total', 'Обработанные запросы', ['endpoint', 'method', 'status'])
+request_latency = registry.histogram(
+    'rate_server_request_duration_seconds', 'Время обработки запроса', ['endpoint'])
+requests_in_progress = registry.gauge(
+    'rate_server_requests_in_progress', 'Запросы в обработке')
+api_key_rejections = registry.counter(
+    'rate_server_api_key_rejections_total', 'Запросы, отклоненные check_api_key', ['endpoint'])
+
+# Должна идти первой: check_api_key может прервать цепочку before_request
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    requests_in_progress.inc()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    request_latency.observe(time.perf_counter() - g.request_started, endpoint)
+    requests_total.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request(error=None):
+    if 'request_started' in g:
+        requests_in_progress.dec()
+
 # Мидлварь для проверки API-ключа
 @app.before_request
 def check_api_key():
-    if request.endpoint in ['get_rate', 'add_rate']:
+    if request.endpoint in ['get_rate', 'get_rates', 'get_rates_history', 'rates_stream', 'convert', 'add_rate']:
         provided_key = request.headers.get('X-API-KEY') or request.args.get('api_key')
         if provided_key != API_KEY:
+            api_key_rejections.inc(request.endpoint)
             return jsonify({'error': 'Invalid API key'}), 403
 
 @app.route('/rate', methods=['GET'])
 def get_rate():
     currency = request.args.get('currency', 'USD').upper()
+    rates = rate_refresher.snapshot.rates
     
-    if currency not in CURRENCY_RATES:
+    if currency not in rates:
         return jsonify({'error': 'Invalid currency'}), 400
     
-    # Здесь можно добавить реальный запрос к API ЦБ или другому источнику
-    rate = CURRENCY_RATES[currency]
+    # Курс на дату из истории (?date=ГГГГ-ММ-ДД)
+    on_date = request.args.get('date')
+    if on_date:
+        try:
+            day = datetime.strptime(on_date, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date'}), 400
+        if day < datetime.now().date():
+            rate = rate_history.rate_on(currency, day)
+            if rate is None:
+                return jsonify({'error': 'No rate for date'}), 404
+            return jsonify({'currency': currency, 'rate': rate, 'date': on_date})
+    
+    rate = rates[currency]
     
     return jsonify({
         'currency': currency,
@@ -53,6 +128,122 @@ def get_rate():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/rates', methods=['GET'])
+def get_rates():
+    snapshot = rate_refresher.snapshot
+    requested = request.args.get('currencies')
+    if requested:
+        currencies = [c.strip().upper() for c in requested.split(',') if c.strip()]
+        invalid = [c for c in currencies if c not in snapshot.rates]
+        if invalid:
+            return jsonify({'error': 'Invalid currency', 'currencies': invalid}), 400
+        rates = {c: snapshot.rates[c] for c in currencies}
+        etag = rates_version(rates)
+    else:
+        rates = dict(snapshot.rates)
+        etag = snapshot.version
+
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({'rates': rates, 'version': etag})
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = RATES_MAX_AGE
+    return response
+
+@app.route('/rates/history', methods=['GET'])
+def get_rates_history():
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'from and to must be dates (YYYY-MM-DD)'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+
+    requested = request.args.get('currencies')
+    if requested:
+        currencies = [c.strip().upper() for c in requested.split(',') if c.strip()]
+    else:
+        currencies = rate_history.currencies()
+
+    # Первая точка по каждой валюте - курс, действовавший на дату from
+    history = {
+        currency: [[day.isoformat(), rate] for day, rate in rate_history.between(currency, start, end)]
+        for currency in currencies
+    }
+    # Версия - от содержимого ответа: меняется, только когда меняются точки периода
+    etag = rates_version({'from': start.isoformat(), 'to': end.isoformat(), 'history': history})
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({'from': start.isoformat(), 'to': end.isoformat(), 'history': history})
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = RATES_MAX_AGE
+    return response
+
+@app.route('/rates/stream', methods=['GET'])
+def rates_stream():
+    # Поток изменений курсов (Server-Sent Events). id события - версия
+    # снимка; при переподключении клиент присылает ее в Last-Event-ID и
+    # сразу получает текущие курсы, если успел пропустить изменение.
+    version = request.headers.get('Last-Event-ID') or request.args.get('version')
+
+    def events(version):
+        while True:
+            snapshot = rate_refresher.wait_for_change(version, RATES_STREAM_HEARTBEAT)
+            if snapshot is None:
+                yield ": ping\n\n"
+                continue
+            version = snapshot.version
+            data = json.dumps({
+                'rates': dict(snapshot.rates),
+                'version': snapshot.version,
+                'updated_at': snapshot.updated_at.isoformat()
+            })
+            yield f"id: {version}\nevent: rates\ndata: {data}\n\n"
+
+    return Response(events(version), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/convert', methods=['POST'])
+def convert():
+    # Все суммы конвертируются по одному снимку курсов; результаты - в том же
+    # порядке. JSON: {"items": [...]} -> {"results": ["89.06", ...]},
+    # двоичный формат - см. conversion.py
+    snapshot = rate_refresher.snapshot
+    binary = request.mimetype == 'application/octet-stream'
+    try:
+        if binary:
+            if request.content_length and request.content_length > CONVERT_MAX_ITEMS * conversion.BINARY_ITEM.size:
+                return jsonify({'error': f'Too many items (max {CONVERT_MAX_ITEMS})'}), 413
+            items = conversion.parse_binary_items(request.get_data())
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or 'items' not in data:
+                return jsonify({'error': 'Expected JSON body {"items": [...]}'}), 400
+            if isinstance(data['items'], list) and len(data['items']) > CONVERT_MAX_ITEMS:
+                return jsonify({'error': f'Too many items (max {CONVERT_MAX_ITEMS})'}), 413
+            items = conversion.parse_json_items(data['items'])
+        results = conversion.convert(snapshot.rates, *items)
+    except conversion.ConversionError as e:
+        return jsonify({'error': str(e), 'items': e.items}), 400
+
+    if binary:
+        response = app.response_class(conversion.pack_binary_results(results),
+                                      mimetype='application/octet-stream')
+        response.headers['X-Rates-Version'] = snapshot.version
+        return response
+    return jsonify({'results': [str(result) for result in results], 'version': snapshot.version})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok', 'timestamp': datetime.now().isoformat()})
@@ -63,4 +254,11 @@ def handle_500(error):
     return jsonify({"message": "UNEXPECTED ERROR"}), 500
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Без перезапуска по изменениям: иначе поток обновления курсов запускается дважды
+    app.run(
+        host=os.getenv('FLASK_HOST', '0.0.0.0'),
+        port=int(os.getenv('FLASK_PORT', '5000')),
+        debug=os.getenv('FLASK_DEBUG', '0') == '1',
+        use_reloader=False,
+        threaded=True
+    )
\ No newline at end of file
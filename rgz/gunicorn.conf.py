@@ -0,0 +1,39 @@
+# Настройки gunicorn для flask_server (gunicorn читает этот файл сам при
+# запуске из каталога rgz: gunicorn wsgi:app)
+import multiprocessing
+import os
+import sys
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}"
+
+# Процессы - для CPU, потоки - для долгих соединений /rates/stream.
+#
+# У каждого процесса свой поток обновления и свой снимок курсов. Версия
+# снимка (ETag /rates, id событий /rates/stream) - хэш самих курсов, поэтому
+# процессы с одинаковыми курсами отдают одинаковые версии:
+#   static - курсы у всех процессов одни и те же;
+#   file   - процессы перечитывают один файл и расходятся не дольше
+#            RATES_REFRESH_INTERVAL после его изменения;
+#   http   - процессы опрашивают источник в разное время и могут получать
+#            разные курсы, из-за чего ETag "прыгает" между процессами и 304
+#            не срабатывают. Поэтому с http запускается один процесс (нагрузку
+#            держат потоки); для нескольких процессов выгружайте курсы в
+#            файл и используйте RATES_PROVIDER=file.
+# Файл истории (RATES_HISTORY_FILE) пишет один процесс - см. rate_history.py.
+default_workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+if os.getenv('RATES_PROVIDER', 'static') == 'http' and workers > 1:
+    print(f"RATES_PROVIDER=http: снимки курсов процессов расходятся, запускаю 1 процесс вместо {workers}",
+          file=sys.stderr)
+    workers = 1
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+
+# Соединения /rates/stream живут долго, но шлют heartbeat, так что таймаут
+# срабатывает только на зависших процессах
+timeout = 60
+keepalive = 5
+
+accesslog = None
+errorlog = '-'
+loglevel = 'info'
@@ -0,0 +1,100 @@
+# Импорт операций из CSV/XLSX: колонки дата (ГГГГ-ММ-ДД), сумма, тип
+# (РАСХОД/ДОХОД). Строки проверяются по тем же правилам, что и при вводе
+# через /add_operation, и загружаются через COPY одной транзакцией.
+import csv
+import io
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+import rollup
+from validation import parse_operation_type, parse_amount, parse_date
+
+MAX_REPORTED_ERRORS = 10
+
+
+class ImportResult:
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+        self.totals = defaultdict(Decimal)
+
+    def reject(self, line_no: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"строка {line_no}: {reason}")
+
+
+def read_csv_rows(buf):
+    text = io.TextIOWrapper(buf, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    # Сначала ';' и табуляция: в выгрузках с русской локалью запятая -
+    # десятичный разделитель, и Sniffer с ',' в списке выбирает ее
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=';\t')
+    except csv.Error:
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',')
+        except csv.Error:
+            dialect = csv.excel
+    yield from csv.reader(text, dialect)
+
+
+def read_xlsx_rows(buf):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(buf, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _records(rows, chat_id: int, result: ImportResult):
+    for line_no, row in enumerate(rows, start=1):
+        cells = [_cell_text(value) for value in row or ()]
+        if not any(cell.strip() for cell in cells):
+            continue
+        try:
+            if len(cells) < 3:
+                raise ValueError("ожидается 3 колонки: дата, сумма, тип")
+            operation_date = parse_date(cells[0])
+            amount = parse_amount(cells[1])
+            operation_type = parse_operation_type(cells[2])
+        except ValueError as e:
+            # Первая строка без даты - заголовок
+            if line_no == 1 and not cells[0].strip()[:1].isdigit():
+                continue
+            result.reject(line_no, str(e))
+            continue
+
+        result.accepted += 1
+        result.totals[(operation_date.replace(day=1), operation_type)] += amount
+        yield operation_date, amount, chat_id, operation_type
+
+
+async def import_operations(conn, chat_id: int, rows) -> ImportResult:
+    result = ImportResult()
+    async with conn.transaction():
+        await conn.copy_records_to_table(
+            'operations',
+            records=_records(rows, chat_id, result),
+            columns=['date', 'sum', 'chat_id', 'type_operation']
+        )
+        await rollup.add_totals(conn, [
+            (chat_id, month, operation_type, total)
+            for (month, operation_type), total in result.totals.items()
+        ])
+    return result
@@ -0,0 +1,236 @@
+# Версионированная схема базы бота. Миграции применяются при старте по
+# порядку, каждая в своей транзакции; примененные версии записываются в
+# schema_migrations. Одновременный старт нескольких ботов разводится
+# advisory-блокировкой.
+#
+#   python migrations.py upgrade             - применить миграции
+#   python migrations.py check --rows 1000000 - проверить планы запросов
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+import asyncpg
+
+import rollup
+from db import DB_CONFIG
+from reports import REPORT_PAGE_QUERIES, FIRST_PAGE_CURSOR, PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_LOCK_ID = 0x72677a  # 'rgz'
+
+# Таблицы создаются с IF NOT EXISTS: в существующих базах они уже есть
+MIGRATIONS = [
+    (1, "base schema", """
+        CREATE TABLE IF NOT EXISTS users (
+            chat_id BIGINT PRIMARY KEY,
+            name VARCHAR(20) NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS operations (
+            id BIGSERIAL PRIMARY KEY,
+            date DATE NOT NULL,
+            sum NUMERIC(12, 2) NOT NULL CHECK (sum > 0),
+            chat_id BIGINT NOT NULL,
+            type_operation VARCHAR(10) NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS budget (
+            chat_id BIGINT NOT NULL,
+            month DATE NOT NULL,
+            amount NUMERIC(12, 2) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (chat_id, month)
+        );
+    """),
+    (2, "monthly totals rollup", rollup.CREATE_TABLE + ";" + rollup.REBUILD),
+    (3, "report indexes", """
+        -- Страница отчета: поиск по chat_id и диапазону дат, порядок (date, id)
+        -- и все колонки в индексе - index only scan без обращения к таблице
+        CREATE INDEX IF NOT EXISTS operations_chat_date_id_idx
+            ON operations (chat_id, date DESC, id DESC)
+            INCLUDE (sum, type_operation);
+    """),
+    (4, "monthly partitions for operations", """
+        -- Партиция на месяц: operations_YYYY_MM. Строки за этот месяц, уже
+        -- попавшие в operations_default, переносятся в новую партицию.
+        CREATE OR REPLACE FUNCTION create_operations_partition(p_month DATE) RETURNS VOID AS $$
+        DECLARE
+            part_name TEXT := format('operations_%s', to_char(p_month, 'YYYY_MM'));
+            next_month DATE := (p_month + INTERVAL '1 month')::date;
+        BEGIN
+            IF to_regclass(part_name) IS NOT NULL THEN
+                RETURN;
+            END IF;
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE operations INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                part_name
+            );
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM operations_default WHERE date >= %L AND date < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                p_month, next_month, part_name
+            );
+            EXECUTE format(
+                'ALTER TABLE operations ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                part_name, p_month, next_month
+            );
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION maintain_operations_partitions(months_ahead INTEGER) RETURNS VOID AS $$
+        BEGIN
+            PERFORM create_operations_partition(
+                (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::date
+            )
+            FROM generate_series(0, months_ahead) AS i;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Перенос данных из обычной таблицы operations в секционированную
+        DO $$
+        DECLARE
+            seq_name TEXT;
+        BEGIN
+            IF (SELECT relkind FROM pg_class WHERE oid = 'operations'::regclass) = 'p' THEN
+                RETURN;
+            END IF;
+
+            ALTER TABLE operations RENAME TO operations_legacy;
+            ALTER INDEX IF EXISTS operations_pkey RENAME TO operations_legacy_pkey;
+            seq_name := pg_get_serial_sequence('operations_legacy', 'id');
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', seq_name);
+
+            EXECUTE format($sql$
+                CREATE TABLE operations (
+                    id BIGINT NOT NULL DEFAULT nextval(%L),
+                    date DATE NOT NULL,
+                    sum NUMERIC(12, 2) NOT NULL,
+                    chat_id BIGINT NOT NULL,
+                    type_operation VARCHAR(10) NOT NULL,
+                    CONSTRAINT operations_pkey PRIMARY KEY (id, date),
+                    CONSTRAINT operations_sum_positive CHECK (sum > 0)
+                ) PARTITION BY RANGE (date)
+            $sql$, seq_name);
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY operations.id', seq_name);
+            CREATE TABLE operations_default PARTITION OF operations DEFAULT;
+
+            PERFORM create_operations_partition(month)
+            FROM (SELECT DISTINCT date_trunc('month', date)::date AS month FROM operations_legacy) months;
+            PERFORM maintain_operations_partitions(3);
+
+            INSERT INTO operations (id, date, sum, chat_id, type_operation)
+            SELECT id, date, sum, chat_id, type_operation FROM operations_legacy;
+            DROP TABLE operations_legacy;
+
+            CREATE INDEX operations_chat_date_id_idx
+                ON operations (chat_id, date DESC, id DESC)
+                INCLUDE (sum, type_operation);
+        END;
+        $$;
+    """),
+]
+
+
+async def upgrade(conn):
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATIONS_LOCK_ID)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        applied = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+
+        for version, name, sql in MIGRATIONS:
+            if version in applied:
+                continue
+            async with conn.transaction():
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                    version, name
+                )
+            logger.info(f"Применена миграция {version}: {name}")
+
+
+def _scans(plan):
+    # Все узлы плана вида (тип узла, таблица)
+    yield plan['Node Type'], plan.get('Relation Name')
+    for child in plan.get('Plans', []):
+        yield from _scans(child)
+
+
+async def check_plans(conn, rows: int):
+    # Генерируем rows операций на ~1000 пользователей за 2 года и проверяем,
+    # что запросы отчета и бюджета не читают таблицы целиком. Все откатывается.
+    month = datetime.now().date().replace(day=1)
+    chat_id = 1
+    queries = {
+        'страница отчета': (
+            REPORT_PAGE_QUERIES['next', False],
+            (chat_id, month, Decimal('1'), *FIRST_PAGE_CURSOR, PAGE_SIZE + 1)
+        ),
+        'бюджет': (
+            "SELECT amount FROM budget WHERE chat_id = $1 AND month = $2::date",
+            (chat_id, month)
+        ),
+    }
+
+    failed = []
+    tr = conn.transaction()
+    await tr.start()
+    try:
+        await conn.execute("""
+            SELECT create_operations_partition((date_trunc('month', $1::date) - make_interval(months => i))::date)
+            FROM generate_series(0, 24) AS i
+        """, month)
+        await conn.execute("""
+            INSERT INTO operations (date, sum, chat_id, type_operation)
+            SELECT $2::date - (i % 730), i % 1000 + 1, i % 1000,
+                   CASE WHEN i % 3 = 0 THEN 'ДОХОД' ELSE 'РАСХОД' END
+            FROM generate_series(1, $1) AS i
+        """, rows, month)
+        await conn.execute("""
+            INSERT INTO budget (chat_id, month, amount)
+            SELECT i % 1000, date_trunc('month', $1::date - i)::date, 10000
+            FROM generate_series(1, 730) AS i
+            ON CONFLICT DO NOTHING
+        """, month)
+        await conn.execute(rollup.REBUILD)
+        await conn.execute("ANALYZE operations; ANALYZE budget; ANALYZE monthly_totals")
+
+        for title, (query, args) in queries.items():
+            plan = json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args))[0]['Plan']
+            seq_scans = [table for node, table in _scans(plan) if node == 'Seq Scan' and table]
+            status = 'OK' if not seq_scans else f"Seq Scan по {', '.join(seq_scans)}"
+            print(f"{title}: {status}")
+            if seq_scans:
+                failed.append(title)
+    finally:
+        await tr.rollback()
+
+    return not failed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['upgrade', 'check'])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        await upgrade(conn)
+        if args.command == 'check' and not await check_plans(conn, args.rows):
+            raise SystemExit(1)
+    finally:
+        await conn.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+# Обслуживание помесячных партиций operations (см. миграцию 4).
+#
+#   python partitions.py maintain --months-ahead 3
+#   python partitions.py retention --keep-months 24 [--drop]
+#
+# retention отсоединяет партиции старше keep_months месяцев и переименовывает
+# их в operations_archive_YYYY_MM (с --drop - удаляет). Итоги в
+# monthly_totals при этом сохраняются, но rollup.py rebuild их уже не
+# восстановит.
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+
+import asyncpg
+
+import db
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r'^operations_(\d{4})_(\d{2})$')
+
+
+async def ensure_upcoming(conn, months_ahead: int = 3):
+    await conn.execute("SELECT maintain_operations_partitions($1)", months_ahead)
+
+
+async def list_partitions(conn) -> list[tuple[date, str]]:
+    rows = await conn.fetch("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'operations'::regclass
+    """)
+    partitions = []
+    for row in rows:
+        match = PARTITION_NAME.match(row['relname'])
+        if match:
+            partitions.append((date(int(match[1]), int(match[2]), 1), row['relname']))
+    return sorted(partitions)
+
+
+async def detach_older_than(conn, keep_months: int, drop: bool = False) -> list[str]:
+    today = datetime.now().date()
+    months = today.year * 12 + today.month - 1 - keep_months
+    cutoff = date(months // 12, months % 12 + 1, 1)
+
+    detached = []
+    for month, name in await list_partitions(conn):
+        if month >= cutoff:
+            break
+        archive_name = f"operations_archive_{month:%Y_%m}"
+        await conn.execute(f'ALTER TABLE operations DETACH PARTITION "{name}"')
+        if drop:
+            await conn.execute(f'DROP TABLE "{name}"')
+        else:
+            await conn.execute(f'ALTER TABLE "{name}" RENAME TO "{archive_name}"')
+        detached.append(name)
+        logger.info(f"Партиция {name} {'удалена' if drop else 'перенесена в ' + archive_name}")
+    return detached
+
+
+async def maintenance_loop(months_ahead: int = 3, interval: float = 24 * 60 * 60):
+    # Фоновая задача бота: заранее создает партиции на следующие месяцы
+    while True:
+        try:
+            async with db.acquire() as conn:
+                await ensure_upcoming(conn, months_ahead)
+        except Exception as e:
+            logger.error(f"Ошибка создания партиций: {e}")
+        await asyncio.sleep(interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['maintain', 'retention'])
+    parser.add_argument('--months-ahead', type=int, default=3)
+    parser.add_argument('--keep-months', type=int, default=24)
+    parser.add_argument('--drop', action='store_true')
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(**db.DB_CONFIG)
+    try:
+        if args.command == 'maintain':
+            await ensure_upcoming(conn, args.months_ahead)
+        else:
+            await detach_older_than(conn, args.keep_months, args.drop)
+        for month, name in await list_partitions(conn):
+            print(f"{month:%Y-%m}  {name}")
+    finally:
+        await conn.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+# Сэмплирующий профайлер для работающего бота. Отдельный поток раз в
+# interval секунд снимает стек потока с циклом событий (sys._current_frames),
+# поэтому бот не замедляется и не требует перезапуска. Результат - файл
+# collapsed stacks для flamegraph.pl / speedscope и сводка самых частых
+# функций.
+#
+#   path, summary = await profiler.profile(30, 'profiles')
+#   profiler.install_signal_handler(seconds=30, output_dir='profiles')  # kill -USR1 <pid>
+#
+# Правится в rgz/profiler.py и копируется в laba5;
+# rgz/test_shared_copies.py падает, если копии разошлись.
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Одновременно идет не больше одного профиля
+_running = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample(thread_id: int, seconds: float, interval: float = 0.005) -> Counter:
+    # Стек от корня к листу -> число попаданий
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        stacks[';'.join(reversed(labels))] += 1
+        del frame
+        time.sleep(interval)
+    return stacks
+
+
+def top_functions(stacks: Counter, limit: int = 15) -> list[str]:
+    total = sum(stacks.values())
+    if not total:
+        return ["Нет сэмплов"]
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for label in set(frames):
+            inclusive[label] += count
+
+    lines = [f"Сэмплов: {total}", "Собственное время:"]
+    lines += [f"{count / total:6.1%}  {label}" for label, count in own.most_common(limit)]
+    lines.append("С вложенными вызовами:")
+    lines += [f"{count / total:6.1%}  {label}" for label, count in inclusive.most_common(limit)]
+    return lines
+
+
+def write_collapsed(stacks: Counter, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+async def profile(seconds: float, output_dir: str = 'profiles',
+                  interval: float = 0.005) -> tuple[str, list[str]]:
+    # Профиль потока, в котором работает вызывающий цикл событий
+    if not _running.acquire(blocking=False):
+        raise RuntimeError("Профилирование уже запущено")
+    try:
+        thread_id = threading.get_ident()
+        stacks = await asyncio.to_thread(sample, thread_id, seconds, interval)
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"profile-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S-%f}.collapsed")
+        await asyncio.to_thread(write_collapsed, stacks, path)
+        summary = top_functions(stacks)
+        logger.info(f"Профиль записан в {path}\n" + "\n".join(summary))
+        return path, summary
+    finally:
+        _running.release()
+
+
+def install_signal_handler(seconds: float = 30, output_dir: str = 'profiles', sig=None):
+    # SIGUSR1 запускает профиль в фоне (только Unix)
+    sig = sig or getattr(signal, 'SIGUSR1', None)
+    if sig is None:
+        return
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    def start():
+        task = loop.create_task(profile(seconds, output_dir))
+        tasks.add(task)
+        task.add_done_callback(_log_failure)
+        task.add_done_callback(tasks.discard)
+
+    loop.add_signal_handler(sig, start)
+
+
+def _log_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Профилирование не выполнено: {task.exception()}")
@@ -0,0 +1,129 @@
+# История курсов: по каждой валюте два массива - дни (ordinal) и курсы.
+# Поиск курса на дату - бинарный поиск по дням. Запись (из потока
+# обновления курсов) не меняет массивы на месте, а собирает новую пару и
+# подменяет ее одной ссылкой, поэтому читатели работают без блокировок.
+#
+# Файл истории пишется целиком во временный файл и подменяется через
+# os.replace, так что читатель (или запуск другого воркера) никогда не
+# видит его наполовину записанным. Писатель у файла один: под gunicorn
+# каждый воркер ведет историю в памяти, но сохраняет ее только тот, кто
+# держит блокировку <файл>.lock; если он завершится, блокировку при
+# следующем сохранении забирает другой.
+import json
+import logging
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: один процесс, блокировка не нужна
+    fcntl = None
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+
+class RateHistory:
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._series: dict[str, tuple[array, array]] = {}
+        self._lock_file = None
+        if path:
+            try:
+                self.load(path)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                # Битый файл не должен мешать запуску; откладываем его в сторону
+                logger.error(f"История курсов {path} не читается, начинаю заново: {e}")
+                self._series = {}
+                try:
+                    os.replace(path, path + '.corrupt')
+                except OSError:
+                    pass
+
+    def currencies(self) -> list[str]:
+        return sorted(self._series)
+
+    def set_rate(self, currency: str, day: date, rate: float) -> bool:
+        # True, если история изменилась
+        days, rates = self._series.get(currency, (array('l'), array('d')))
+        ordinal = day.toordinal()
+        i = bisect_left(days, ordinal)
+        if i < len(days) and days[i] == ordinal:
+            if rates[i] == rate:
+                return False
+            rates = array('d', rates)
+            rates[i] = rate
+        else:
+            days = days[:i] + array('l', [ordinal]) + days[i:]
+            rates = rates[:i] + array('d', [rate]) + rates[i:]
+        self._series[currency] = (days, rates)
+        return True
+
+    def record(self, snapshot):
+        # Курс дня - последний полученный за этот день
+        day = snapshot.updated_at.date()
+        changed = False
+        for currency, rate in snapshot.rates.items():
+            changed |= self.set_rate(currency, day, rate)
+        if changed and self.path and self._is_writer():
+            try:
+                self.save(self.path)
+            except OSError as e:
+                logger.error(f"Не удалось сохранить историю курсов: {e}")
+
+    def _is_writer(self) -> bool:
+        # Неблокирующая блокировка файла: держит ее ровно один процесс
+        if self._lock_file is not None or fcntl is None:
+            return True
+        lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def rate_on(self, currency: str, day: date) -> float | None:
+        # Курс, действовавший на дату: последняя точка не позже day
+        series = self._series.get(currency)
+        if series is None:
+            return None
+        days, rates = series
+        i = bisect_right(days, day.toordinal()) - 1
+        return rates[i] if i >= 0 else None
+
+    def between(self, currency: str, start: date, end: date) -> list[tuple[date, float]]:
+        # Точки за [start, end] плюс курс, действовавший на start
+        series = self._series.get(currency)
+        if series is None:
+            return []
+        days, rates = series
+        lo = max(bisect_right(days, start.toordinal()) - 1, 0)
+        hi = bisect_right(days, end.toordinal())
+        return [(date.fromordinal(days[i]), rates[i]) for i in range(lo, hi)]
+
+    def load(self, path: str):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        for currency, points in data.items():
+            for day, rate in points:
+                self.set_rate(currency.upper(), date.fromisoformat(day), float(rate))
+
+    def save(self, path: str):
+        data = {
+            currency: [[date.fromordinal(d).isoformat(), r] for d, r in zip(*self._series[currency])]
+            for currency in self.currencies()
+        }
+        fd, tmp_path = tempfile.mkstemp(prefix='.rates-history-', dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,142 @@
+# Источники курсов для flask_server. Фоновый поток периодически забирает
+# курсы у провайдера и публикует неизменяемый снимок; обработчики читают
+# текущий снимок одной ссылкой, без блокировок, и никогда не видят
+# наполовину обновленную таблицу.
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateSnapshot:
+    rates: MappingProxyType
+    version: str
+    updated_at: datetime
+
+
+def rates_version(rates: dict) -> str:
+    # Версия набора курсов: меняется только при изменении самих курсов
+    return hashlib.sha1(json.dumps(rates, sort_keys=True).encode()).hexdigest()
+
+
+def make_snapshot(rates: dict) -> RateSnapshot:
+    clean = {}
+    for currency, rate in rates.items():
+        try:
+            rate = float(rate)
+        except (TypeError, ValueError):
+            continue
+        if rate > 0:
+            clean[str(currency).upper()] = rate
+    if not clean:
+        raise ValueError("провайдер не вернул ни одного курса")
+    return RateSnapshot(MappingProxyType(clean), rates_version(clean), datetime.now())
+
+
+class StaticProvider:
+    def __init__(self, rates: dict):
+        self.rates = dict(rates)
+
+    def fetch(self) -> dict:
+        return self.rates
+
+
+class FileProvider:
+    # JSON-файл вида {"USD": 75.5, ...} или {"rates": {...}}
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> dict:
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('rates', data)
+
+
+class HttpProvider:
+    # GET url -> JSON того же формата, что и у FileProvider
+    def __init__(self, url: str, timeout: float = 5):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch(self) -> dict:
+        response = self.session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return data.get('rates', data)
+
+
+class RateRefresher:
+    def __init__(self, provider, interval: float = 60, initial: dict | None = None):
+        self.provider = provider
+        self.interval = interval
+        self.snapshot = make_snapshot(initial) if initial else None
+        # Вызываются из потока обновления с новым снимком при каждом изменении
+        self.listeners = []
+        # Будит ожидающих в wait_for_change (поток изменений /rates/stream)
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def refresh_once(self) -> bool:
+        try:
+            snapshot = make_snapshot(self.provider.fetch())
+        except Exception as e:
+            logger.error(f"Не удалось обновить курсы: {e}")
+            return False
+        if self.snapshot is None or snapshot.version != self.snapshot.version:
+            # Присваивание ссылки атомарно - читатели видят старый или новый снимок целиком
+            with self._changed:
+                self.snapshot = snapshot
+                self._changed.notify_all()
+            logger.info(f"Курсы обновлены: {dict(snapshot.rates)}")
+            for listener in self.listeners:
+                try:
+                    listener(snapshot)
+                except Exception as e:
+                    logger.error(f"Ошибка обработчика обновления курсов: {e}")
+        return True
+
+    def wait_for_change(self, version: str | None, timeout: float) -> RateSnapshot | None:
+        # Снимок с версией, отличной от version, или None по таймауту
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self.snapshot is not None and self.snapshot.version != version,
+                timeout
+            )
+            snapshot = self.snapshot
+        return snapshot if snapshot is not None and snapshot.version != version else None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.refresh_once()
+        self._thread = threading.Thread(target=self._run, name='rate-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh_once()
+
+
+def provider_from_env(env, default_rates: dict):
+    kind = env.get('RATES_PROVIDER', 'static')
+    if kind == 'file':
+        return FileProvider(env['RATES_FILE'])
+    if kind == 'http':
+        return HttpProvider(env['RATES_URL'], timeout=float(env.get('RATES_TIMEOUT', '5')))
+    return StaticProvider(default_rates)
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    value: object  # None - отрицательный результат (курс недоступен)
+    expires_at: float
+    stale_until: float
+
+
+class RateCache:
+    """Асинхронный клиент курсов валют с TTL-кэшем.
+
+    Свежие значения отдаются из кэша, устаревшие - тоже, но с фоновым
+    обновлением (stale-while-revalidate). Ошибки кэшируются на короткий
+    negative_ttl. Одновременные запросы одной валюты сливаются в один
+    запрос к серверу.
+
+    subscribe() держит подписку на поток изменений /rates/stream и обновляет
+    кэш на месте; пока подписка жива, курсы живут stream_ttl (если задан)
+    вместо ttl.
+    """
+
+    def __init__(self, base_url: str, api_key: str | None = None, ttl: float = 300,
+                 stale_ttl: float = 3600, negative_ttl: float = 10, timeout: float = 3,
+                 stream_ttl: float | None = None, trace_configs: list | None = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.stream_ttl = stream_ttl
+        self.trace_configs = trace_configs
+        self.streaming = False
+        self.stream_version: str | None = None
+        self._entries: dict[str, _Entry] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self):
+        if self._session is None:
+            headers = {'X-API-KEY': self.api_key} if self.api_key else None
+            self._session = aiohttp.ClientSession(timeout=self.timeout, headers=headers,
+                                                  trace_configs=self.trace_configs)
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get(self, currency: str) -> Decimal | None:
+        currency = currency.upper()
+        return await self._get(currency, lambda: self._fetch_rate(currency))
+
+    async def get_history(self, currency: str, start: date, end: date) -> list[tuple[date, Decimal]] | None:
+        # Курсы за период одним запросом; первая точка - курс на дату start
+        currency = currency.upper()
+        key = f"{currency}@{start}..{end}"
+        return await self._get(key, lambda: self._fetch_history(currency, start, end))
+
+    def put(self, currency: str, rate: Decimal):
+        now = time.monotonic()
+        ttl = self._ttl()
+        self._entries[currency.upper()] = _Entry(rate, now + ttl, now + ttl + self.stale_ttl)
+
+    async def subscribe(self, retry_delay: float = 1, max_retry_delay: float = 60):
+        # Фоновая задача: слушает /rates/stream, переподключается с backoff
+        delay = retry_delay
+        while True:
+            try:
+                await self._listen()
+                delay = retry_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Поток курсов недоступен: {e}")
+            finally:
+                self._stream_lost()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_retry_delay)
+
+    def invalidate(self, currency: str | None = None):
+        if currency is None:
+            self._entries.clear()
+            return
+        currency = currency.upper()
+        for key in [k for k in self._entries if k == currency or k.startswith(f"{currency}@")]:
+            del self._entries[key]
+
+    def _ttl(self) -> float:
+        return self.stream_ttl if self.streaming and self.stream_ttl else self.ttl
+
+    async def _listen(self):
+        await self.start()
+        headers = {'Accept': 'text/event-stream'}
+        if self.stream_version:
+            headers['Last-Event-ID'] = self.stream_version
+        # Общий таймаут сессии здесь не подходит - соединение бессрочное
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout.total, sock_read=60)
+        async with self._session.get(f"{self.base_url}/rates/stream",
+                                     headers=headers, timeout=timeout) as response:
+            if response.status != 200:
+                raise RuntimeError(f"сервер вернул {response.status}")
+            self.streaming = True
+            logger.info("Подписка на изменения курсов установлена")
+
+            event = {}
+            async for raw in response.content:
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if line:
+                    if not line.startswith(':'):
+                        field, _, value = line.partition(':')
+                        event[field] = value.removeprefix(' ')
+                    continue
+                if event.get('event') == 'rates' and 'data' in event:
+                    self._apply(json.loads(event['data']))
+                event = {}
+
+    def _apply(self, data: dict):
+        self.stream_version = data.get('version')
+        rates = data.get('rates', {})
+        for currency, rate in rates.items():
+            self.put(currency, Decimal(str(rate)))
+            # История за период, включающий сегодня, могла измениться
+            for key in [k for k in self._entries if k.startswith(f"{currency.upper()}@")]:
+                del self._entries[key]
+        logger.info(f"Курсы обновлены по подписке: {rates}")
+
+    def _stream_lost(self):
+        if not self.streaming:
+            return
+        self.streaming = False
+        # Изменения могли пройти мимо: сокращаем срок жизни до обычного ttl
+        limit = time.monotonic() + self.ttl
+        for entry in self._entries.values():
+            entry.expires_at = min(entry.expires_at, limit)
+
+    async def _get(self, key: str, fetch):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            if now < entry.expires_at:
+                return entry.value
+            if entry.value is not None and now < entry.stale_until:
+                # Отдаем устаревшее значение, обновляем в фоне
+                self._refresh(key, fetch)
+                return entry.value
+
+        return await asyncio.shield(self._refresh(key, fetch))
+
+    def _refresh(self, key: str, fetch) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _load(self, key: str, fetch):
+        try:
+            value = await fetch()
+        except Exception as e:
+            logger.error(f"Ошибка получения курса {key}: {e}")
+            value = None
+
+        now = time.monotonic()
+        if value is not None:
+            ttl = self._ttl()
+            self._entries[key] = _Entry(value, now + ttl, now + ttl + self.stale_ttl)
+            return value
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.value is not None and now < entry.stale_until:
+            # Сервер недоступен - продолжаем отдавать старый курс, но не долбим сервер
+            entry.expires_at = now + self.negative_ttl
+            return entry.value
+
+        self._entries[key] = _Entry(None, now + self.negative_ttl, now + self.negative_ttl)
+        return None
+
+    async def _fetch_json(self, path: str, params: dict) -> dict | None:
+        await self.start()
+        async with self._session.get(f"{self.base_url}{path}", params=params) as response:
+            if response.status != 200:
+                logger.warning(f"Сервер курсов вернул {response.status} для {path} {params}")
+                return None
+            return await response.json()
+
+    async def _fetch_rate(self, currency: str) -> Decimal | None:
+        data = await self._fetch_json("/rate", {'currency': currency})
+        rate = data.get('rate') if data else None
+        return Decimal(str(rate)) if rate is not None else None
+
+    async def _fetch_history(self, currency: str, start: date, end: date) -> list | None:
+        data = await self._fetch_json("/rates/history", {
+            'from': start.isoformat(), 'to': end.isoformat(), 'currencies': currency
+        })
+        points = data.get('history', {}).get(currency) if data else None
+        if not points:
+            return None
+        return [(date.fromisoformat(day), Decimal(str(rate))) for day, rate in points]
@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+
+import db
+
+
+class RegistrationCache:
+    """Кэш зарегистрированных пользователей (chat_id -> логин).
+
+    Зарегистрированные хранятся без срока (LRU с ограничением размера),
+    незарегистрированные - только negative_ttl секунд, чтобы /reg в другом
+    процессе был виден быстро.
+    """
+
+    def __init__(self, max_size: int = 10000, negative_ttl: float = 30, clock=time.monotonic):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._users: OrderedDict[int, str] = OrderedDict()
+        self._unregistered: dict[int, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_name(self, chat_id: int) -> str | None:
+        name = self._users.get(chat_id)
+        if name is not None:
+            self._users.move_to_end(chat_id)
+            self.hits += 1
+            return name
+
+        expires_at = self._unregistered.get(chat_id)
+        if expires_at is not None:
+            if self.clock() < expires_at:
+                self.hits += 1
+                return None
+            del self._unregistered[chat_id]
+
+        self.misses += 1
+        async with db.acquire() as conn:
+            name = await conn.fetchval("SELECT name FROM users WHERE chat_id = $1", chat_id)
+        if name is None:
+            self._remember_unregistered(chat_id)
+        else:
+            self.add(chat_id, name)
+        return name
+
+    async def is_registered(self, chat_id: int) -> bool:
+        return await self.get_name(chat_id) is not None
+
+    def add(self, chat_id: int, name: str):
+        self._unregistered.pop(chat_id, None)
+        self._users[chat_id] = name
+        self._users.move_to_end(chat_id)
+        if len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    def invalidate(self, chat_id: int):
+        # Следующая проверка пойдет в базу (например, после /start)
+        self._users.pop(chat_id, None)
+        self._unregistered.pop(chat_id, None)
+
+    def _remember_unregistered(self, chat_id: int):
+        if len(self._unregistered) >= self.max_size:
+            now = self.clock()
+            self._unregistered = {k: v for k, v in self._unregistered.items() if v > now}
+            if len(self._unregistered) >= self.max_size:
+                self._unregistered.clear()
+        self._unregistered[chat_id] = self.clock() + self.negative_ttl
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'registered': len(self._users),
+            'unregistered': len(self._unregistered),
+        }
@@ -0,0 +1,136 @@
+from datetime import date
+from decimal import Decimal
+
+PAGE_SIZE = 20
+
+# Курсор "до начала" списка: первая страница берется от самой новой операции
+FIRST_PAGE_CURSOR = (date(9999, 12, 31), 2 ** 63 - 1)
+
+# Страница отчета за месяц одним запросом: первая строка - итоги (сумма
+# расходов из monthly_totals и бюджет), за ней операции страницы.
+# Пагинация по ключу (date, id): "next" - более старые операции после
+# курсора, "prev" - более новые. Конвертация и округление (ROUND_HALF_UP)
+# выполняются в базе.
+_REPORT_PAGE_QUERY = """
+    WITH {history_cte}page AS (
+        SELECT id, date, sum, type_operation
+        FROM operations
+        WHERE chat_id = $1
+        AND date >= $2
+        AND date < $2::date + INTERVAL '1 month'
+        AND (date, id) {cmp} ($4::date, $5::bigint)
+        ORDER BY date {order}, id {order}
+        LIMIT $6
+    )
+    SELECT *
+    FROM (
+        SELECT
+            0 AS part,
+            NULL::bigint AS id,
+            NULL::date AS date,
+            NULL::numeric AS amount,
+            NULL::text AS type_operation,
+            t.total_expenses,
+            {total_converted} AS total_expenses_converted,
+            b.amount AS budget,
+            ROUND(b.amount / $3::numeric, 2) AS budget_converted,
+            {remaining_converted} AS remaining_converted
+        FROM (
+            SELECT COALESCE(SUM(total), 0) AS total_expenses
+            FROM monthly_totals
+            WHERE chat_id = $1 AND month = $2 AND type_operation = 'РАСХОД'
+        ) t
+        {totals_join}
+        LEFT JOIN budget b ON b.chat_id = $1 AND b.month = $2
+        UNION ALL
+        SELECT 1, p.id, p.date, ROUND(p.sum / {page_rate}, 2), p.type_operation,
+               NULL, NULL, NULL, NULL, NULL
+        FROM page p
+        {page_join}
+    ) report
+    ORDER BY part, date DESC, id DESC
+"""
+
+# Один курс ($3) на весь месяц
+_SINGLE_RATE = dict(
+    history_cte='',
+    totals_join='',
+    total_converted='ROUND(t.total_expenses / $3::numeric, 2)',
+    remaining_converted='ROUND((b.amount - t.total_expenses) / $3::numeric, 2)',
+    page_rate='$3::numeric',
+    page_join='',
+)
+
+# Каждая операция по курсу на свою дату: история передается массивами дней
+# ($7) и курсов ($8), первая точка действует и до своей даты. Сумма
+# расходов в этом режиме - сумма сконвертированных операций месяца, бюджет
+# конвертируется по текущему курсу ($3).
+_RATE_BY_DATE = dict(
+    history_cte="""history AS (
+        SELECT
+            CASE WHEN row_number() OVER w = 1 THEN '-infinity'::date ELSE day END AS day,
+            COALESCE(LEAD(day) OVER w, 'infinity'::date) AS next_day,
+            rate
+        FROM unnest($7::date[], $8::numeric[]) AS h(day, rate)
+        WINDOW w AS (ORDER BY day)
+    ),
+    """,
+    totals_join="""CROSS JOIN (
+            SELECT COALESCE(SUM(ROUND(o.sum / h.rate, 2)), 0) AS converted
+            FROM operations o
+            JOIN history h ON o.date >= h.day AND o.date < h.next_day
+            WHERE o.chat_id = $1
+            AND o.date >= $2
+            AND o.date < $2::date + INTERVAL '1 month'
+            AND o.type_operation = 'РАСХОД'
+        ) c""",
+    total_converted='c.converted',
+    remaining_converted='ROUND(b.amount / $3::numeric, 2) - c.converted',
+    page_rate='h.rate',
+    page_join='JOIN history h ON p.date >= h.day AND p.date < h.next_day',
+)
+
+REPORT_PAGE_QUERIES = {
+    (direction, by_date): _REPORT_PAGE_QUERY.format(
+        cmp=cmp, order=order, **(_RATE_BY_DATE if by_date else _SINGLE_RATE)
+    )
+    for direction, cmp, order in [('next', '<', 'DESC'), ('prev', '>', 'ASC')]
+    for by_date in (False, True)
+}
+
+
+class ReportPage:
+    def __init__(self, rows, direction: str, from_cursor: bool, page_size: int):
+        first = rows[0]
+        operations = rows[1:]
+        has_more = len(operations) > page_size
+        if has_more:
+            # Лишняя строка - самая дальняя от курсора
+            operations = operations[:page_size] if direction == 'next' else operations[-page_size:]
+
+        self.operations = [
+            (row['id'], row['date'], row['amount'], row['type_operation'])
+            for row in operations
+        ]
+        if direction == 'next':
+            self.has_prev, self.has_next = from_cursor, has_more
+        else:
+            self.has_prev, self.has_next = has_more, True
+
+        self.total_expenses = Decimal(first['total_expenses'])
+        self.total_expenses_converted = first['total_expenses_converted']
+        self.budget = Decimal(first['budget']) if first['budget'] is not None else None
+        self.budget_converted = first['budget_converted']
+        self.remaining_converted = first['remaining_converted']
+
+
+async def fetch_report_page(conn, chat_id: int, month: date, rate: Decimal,
+                            cursor: tuple | None = None, direction: str = 'next',
+                            page_size: int = PAGE_SIZE, history: list | None = None) -> ReportPage:
+    # history - [(дата, курс), ...] для конвертации по курсу на дату операции
+    cursor_date, cursor_id = cursor or FIRST_PAGE_CURSOR
+    args = [chat_id, month, rate, cursor_date, cursor_id, page_size + 1]
+    if history:
+        args += [[day for day, _ in history], [day_rate for _, day_rate in history]]
+    rows = await conn.fetch(REPORT_PAGE_QUERIES[direction, bool(history)], *args)
+    return ReportPage(rows, direction, cursor is not None, page_size)
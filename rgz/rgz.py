@@ -1,16 +1,26 @@
+import html
 import logging
 import os
 import asyncio
 from decimal import Decimal, ROUND_HALF_UP
 from dotenv import load_dotenv
-from aiogram import Bot, Dispatcher, types
+from aiogram import Bot, Dispatcher, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.filters import Command
-import psycopg2
-from datetime import datetime
-import requests
-from functools import lru_cache
+from aiogram.filters import Command, CommandObject
+from datetime import datetime, timedelta
+import db
+from rates import RateCache
+from reports import fetch_report_page
+import rollup
+import migrations
+import partitions
+from registration import RegistrationCache
+from validation import parse_operation_type, parse_amount, parse_date
+import importer
+from write_behind import OperationWriter
+from bot_metrics import BotMetrics
+import profiler
 
 # Настройка логирования
 logging.basicConfig(
@@ -24,16 +34,58 @@ load_dotenv()
 ### ПОМЕНЯТТЬ ТУТА АААААААААААААААААААААААААААААААААААААААААААААААААААААААААААААААА
 API_TOKEN = os.getenv("TELEGRAM_API_TOKEN")  
 FLASK_SERVER_URL = os.getenv('FLASK_SERVER_URL', 'http://localhost:5000')
-DB_CONFIG = {
-    "user": "postgres",
-    "password": "postgres",
-    "database": "postgres",
-    "host": "localhost",
-    "port": 5433
-}
+FLASK_API_KEY = os.getenv('FLASK_API_KEY')
+RATE_TTL = float(os.getenv('RATE_TTL', '300'))
+RATE_STALE_TTL = float(os.getenv('RATE_STALE_TTL', '3600'))
+RATE_NEGATIVE_TTL = float(os.getenv('RATE_NEGATIVE_TTL', '10'))
+# Подписка на изменения курсов (/rates/stream); пока она жива, курсы
+# обновляются сервером и в кэше живут RATE_STREAM_TTL
+RATE_STREAM = os.getenv('RATE_STREAM', '1') == '1'
+RATE_STREAM_TTL = float(os.getenv('RATE_STREAM_TTL', '86400'))
+REGISTRATION_CACHE_SIZE = int(os.getenv('REGISTRATION_CACHE_SIZE', '10000'))
+REGISTRATION_NEGATIVE_TTL = float(os.getenv('REGISTRATION_NEGATIVE_TTL', '30'))
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', '500'))
+WRITE_BEHIND_MAX_DELAY = float(os.getenv('WRITE_BEHIND_MAX_DELAY', '0.005'))
+# Конвертировать каждую операцию по курсу на ее дату (иначе - по текущему)
+RATE_BY_OPERATION_DATE = os.getenv('RATE_BY_OPERATION_DATE', '0') == '1'
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+# Сводка метрик в лог раз в BOT_METRICS_SUMMARY_INTERVAL секунд (0 - не писать),
+# BOT_METRICS_PORT - локальный /metrics для Prometheus
+BOT_METRICS_SUMMARY_INTERVAL = float(os.getenv('BOT_METRICS_SUMMARY_INTERVAL', '300'))
+BOT_METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', '0'))
+# Профилирование по команде /profile [секунды] (только для PROFILE_ADMIN_IDS)
+# и по сигналу SIGUSR1; файлы пишутся в PROFILE_DIR
+PROFILE_ADMIN_IDS = {int(x) for x in os.getenv('PROFILE_ADMIN_IDS', '').split(',') if x.strip()}
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', '30'))
+PROFILE_MAX_SECONDS = 300
+TELEGRAM_MESSAGE_LIMIT = 4096
+TELEGRAM_MAX_DOWNLOAD = 20 * 1024 * 1024
 
 bot = Bot(token=API_TOKEN)
 dp = Dispatcher()
+bot_metrics = BotMetrics()
+bot_metrics.setup(dp, bot)
+db.timing_listeners.append(lambda elapsed: bot_metrics.observe_dependency('db', 'postgres', elapsed))
+rate_cache = RateCache(
+    FLASK_SERVER_URL,
+    api_key=FLASK_API_KEY,
+    ttl=RATE_TTL,
+    stale_ttl=RATE_STALE_TTL,
+    negative_ttl=RATE_NEGATIVE_TTL,
+    stream_ttl=RATE_STREAM_TTL if RATE_STREAM else None,
+    trace_configs=[bot_metrics.http_trace_config()]
+)
+registered_users = RegistrationCache(
+    max_size=REGISTRATION_CACHE_SIZE,
+    negative_ttl=REGISTRATION_NEGATIVE_TTL
+)
+# Пакетная запись операций (WRITE_BEHIND=1), иначе каждая операция - своя транзакция
+operation_writer = (
+    OperationWriter(batch_size=WRITE_BEHIND_BATCH_SIZE, max_delay=WRITE_BEHIND_MAX_DELAY)
+    if WRITE_BEHIND else None
+)
 
 class Register(StatesGroup):
     waiting_for_login = State()
@@ -49,35 +101,20 @@ class OperationsChoice(StatesGroup):
 class BudgetStates(StatesGroup):
     waiting_for_budget = State()
 
-def db_connection():
-    return psycopg2.connect(**DB_CONFIG)
-
-@lru_cache(maxsize=3)
-def get_cached_rate(currency: str) -> Decimal:
-    try:
-        response = requests.get(
-            f"{FLASK_SERVER_URL}/rate?currency={currency}",
-            timeout=3
-        )
-        if response.status_code == 200:
-            rate = response.json().get('rate', 1.0)
-            return Decimal(str(rate))  # Явное преобразование в Decimal
-        return Decimal('1.0')
-    except Exception as e:
-        logger.error(f"Ошибка подключения: {e}")
-        return Decimal('1.0')
-
-def db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+class ImportStates(StatesGroup):
+    waiting_for_file = State()
 
 # Команда /start
 @dp.message(Command("start"))
 async def start(message: types.Message):
+    # Регистрация могла пройти в другом процессе - перечитаем ее при следующей проверке
+    registered_users.invalidate(message.from_user.id)
     await message.answer(
         "💰 <b>Финансовый менеджер</b> 💰\n\n"
         "Доступные команды:\n"
         "/reg - регистрация\n"
         "/add_operation - добавить операцию\n"
+        "/import - загрузить операции из CSV/XLSX\n"
         "/operations - просмотреть операции\n"
         "/setbudget - установить бюджет на месяц\n\n"
         "Используйте кнопки для удобного ввода данных.",
@@ -89,11 +126,7 @@ async def start(message: types.Message):
 async def register(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     try:
-        conn = db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM users WHERE chat_id = %s", (user_id,))
-        if cursor.fetchone():
+        if await registered_users.is_registered(user_id):
             await message.answer("ℹ️ Вы уже зарегистрированы.")
             return
         
@@ -106,11 +139,6 @@ async def register(message: types.Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка при регистрации: {e}")
         await message.answer("⚠️ Произошла ошибка. Попробуйте позже.")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 # Обработка логина
 @dp.message(Register.waiting_for_login)
@@ -127,19 +155,18 @@ async def save_login(message: types.Message, state: FSMContext):
         return
     
     try:
-        conn = db_connection()
-        cursor = conn.cursor()
+        async with db.acquire() as conn:
+            login_taken = await conn.fetchrow("SELECT chat_id FROM users WHERE name = $1", login)
+            if not login_taken:
+                await conn.execute(
+                    "INSERT INTO users (name, chat_id) VALUES ($1, $2)",
+                    login, user_id
+                )
         
-        cursor.execute("SELECT chat_id FROM users WHERE name = %s", (login,))
-        if cursor.fetchone():
+        if login_taken:
             await message.answer("❌ Этот логин уже занят. Выберите другой.")
             return
-        
-        cursor.execute(
-            "INSERT INTO users (name, chat_id) VALUES (%s, %s)",
-            (login, user_id)
-        )
-        conn.commit()
+        registered_users.add(user_id, login)
         
         await message.answer(f"✅ Регистрация успешна! Добро пожаловать, <b>{login}</b>!", parse_mode="HTML")
         await state.clear()
@@ -147,24 +174,13 @@ async def save_login(message: types.Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка при сохранении логина: {e}")
         await message.answer("⚠️ Произошла ошибка при регистрации. Попробуйте снова.")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 # Добавление операции
 @dp.message(Command("add_operation"))
 async def add_operation(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     try:
-        conn = db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM users WHERE chat_id = %s", (user_id,))
-        user = cursor.fetchone()
-        
-        if not user:
+        if not await registered_users.is_registered(user_id):
             await message.answer("❌ Вы не зарегистрированы. Введите команду /reg для регистрации.")
             return
         
@@ -182,18 +198,13 @@ async def add_operation(message: types.Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка при добавлении операции: {e}")
         await message.answer("⚠️ Произошла ошибка. Попробуйте позже.")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 # Обработка типа операции
 @dp.message(AddOperation.waiting_for_type)
 async def process_type(message: types.Message, state: FSMContext):
-    operation_type = message.text.upper()
-    
-    if operation_type not in ["РАСХОД", "ДОХОД"]:
+    try:
+        operation_type = parse_operation_type(message.text)
+    except ValueError:
         await message.answer("❌ Пожалуйста, выберите тип операции с помощью кнопок.")
         return
     
@@ -205,9 +216,7 @@ async def process_type(message: types.Message, state: FSMContext):
 @dp.message(AddOperation.waiting_for_sum)
 async def process_sum(message: types.Message, state: FSMContext):
     try:
-        amount = Decimal(message.text.replace(',', '.'))
-        if amount <= 0:
-            raise ValueError
+        amount = parse_amount(message.text)
     except ValueError:
         await message.answer("❌ Пожалуйста, введите корректную сумму (положительное число).")
         return
@@ -224,21 +233,18 @@ async def process_date(message: types.Message, state: FSMContext):
     amount = user_data['amount']
     
     try:
-        operation_date = datetime.strptime(message.text, '%Y-%m-%d').date()
+        operation_date = parse_date(message.text)
     except ValueError:
         await message.answer("❌ Неверный формат даты. Используйте ГГГГ-ММ-ДД.")
         return
     
     user_id = message.from_user.id
     try:
-        conn = db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "INSERT INTO operations (date, sum, chat_id, type_operation) VALUES (%s, %s, %s, %s)",
-            (operation_date, amount, user_id, operation_type)
-        )
-        conn.commit()
+        if operation_writer is not None:
+            await operation_writer.submit(user_id, operation_date, amount, operation_type)
+        else:
+            async with db.acquire() as conn:
+                await rollup.record_operation(conn, user_id, operation_date, amount, operation_type)
         
         await message.answer(
             f"✅ Операция успешно добавлена:\n\n"
@@ -253,30 +259,98 @@ async def process_date(message: types.Message, state: FSMContext):
         await message.answer("⚠️ Произошла ошибка при сохранении операции. Попробуйте снова.")
     finally:
         await state.clear()
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+
+# Импорт операций из файла
+@dp.message(Command("import"))
+async def import_command(message: types.Message, state: FSMContext):
+    user_id = message.from_user.id
+    try:
+        if not await registered_users.is_registered(user_id):
+            await message.answer("❌ Вы не зарегистрированы. Введите команду /reg для регистрации.")
+            return
+        
+        await message.answer(
+            "📎 Отправьте файл CSV или XLSX с колонками:\n"
+            "<b>дата</b> (ГГГГ-ММ-ДД), <b>сумма</b>, <b>тип</b> (РАСХОД/ДОХОД).\n"
+            "Для отмены введите 'отмена'.",
+            parse_mode="HTML"
+        )
+        await state.set_state(ImportStates.waiting_for_file)
+        
+    except Exception as e:
+        logger.error(f"Ошибка при импорте: {e}")
+        await message.answer("⚠️ Произошла ошибка. Попробуйте позже.")
+
+@dp.message(ImportStates.waiting_for_file, F.document)
+async def process_import_file(message: types.Message, state: FSMContext):
+    document = message.document
+    file_name = (document.file_name or "").lower()
+    
+    if file_name.endswith(".csv"):
+        read_rows = importer.read_csv_rows
+    elif file_name.endswith(".xlsx"):
+        read_rows = importer.read_xlsx_rows
+    else:
+        await message.answer("❌ Поддерживаются только файлы .csv и .xlsx.")
+        return
+    
+    if document.file_size and document.file_size > TELEGRAM_MAX_DOWNLOAD:
+        await message.answer("❌ Файл слишком большой (максимум 20 МБ).")
+        return
+    
+    user_id = message.from_user.id
+    try:
+        file = await bot.get_file(document.file_id)
+        buf = await bot.download_file(file.file_path)
+        
+        async with db.acquire() as conn:
+            result = await importer.import_operations(conn, user_id, read_rows(buf))
+    except ImportError:
+        await message.answer("⚠️ Импорт XLSX недоступен на сервере. Сохраните файл как CSV.")
+        return
+    except Exception as e:
+        logger.error(f"Ошибка при импорте файла: {e}", exc_info=True)
+        await message.answer("⚠️ Не удалось импортировать файл. Ни одна операция не сохранена.")
+        return
+    finally:
+        await state.clear()
+    
+    # Операции уже сохранены - ошибка отправки отчета не ошибка импорта
+    response_text = (
+        f"✅ Импорт завершен.\n\n"
+        f"<b>Принято:</b> {result.accepted}\n"
+        f"<b>Отклонено:</b> {result.rejected}"
+    )
+    if result.errors:
+        # В ошибках текст ячеек из файла
+        response_text += "\n\n" + "\n".join(html.escape(error) for error in result.errors)
+        if result.rejected > len(result.errors):
+            response_text += f"\n... и еще {result.rejected - len(result.errors)}"
+    await answer_chunked(message, response_text, parse_mode="HTML")
+
+@dp.message(ImportStates.waiting_for_file)
+async def process_import_other(message: types.Message, state: FSMContext):
+    if (message.text or "").lower() == 'отмена':
+        await message.answer("❌ Импорт отменен.")
+        await state.clear()
+        return
+    await message.answer("📎 Отправьте файл CSV или XLSX или введите 'отмена'.")
 
 # Установка бюджета
 @dp.message(Command("setbudget"))
 async def set_budget_command(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     try:
-        conn = db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM users WHERE chat_id = %s", (user_id,))
-        if not cursor.fetchone():
+        current_month = datetime.now().date().replace(day=1)
+        if not await registered_users.is_registered(user_id):
             await message.answer("❌ Вы не зарегистрированы. Введите команду /reg для регистрации.")
             return
         
-        current_month = datetime.now().date().replace(day=1)
-        cursor.execute(
-    "SELECT amount FROM budget WHERE chat_id = %s AND month = %s::date",
-    (user_id, current_month)
-)
-        existing_budget = cursor.fetchone()
+        async with db.acquire() as conn:
+            existing_budget = await conn.fetchrow(
+                "SELECT amount FROM budget WHERE chat_id = $1 AND month = $2::date",
+                user_id, current_month
+            )
         
         if existing_budget:
             await message.answer(
@@ -291,11 +365,6 @@ async def set_budget_command(message: types.Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка при установке бюджета: {e}")
         await message.answer("⚠️ Произошла ошибка. Попробуйте позже.")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 @dp.message(BudgetStates.waiting_for_budget)
 async def process_budget(message: types.Message, state: FSMContext):
@@ -308,9 +377,7 @@ async def process_budget(message: types.Message, state: FSMContext):
         return
     
     try:
-        amount = Decimal(budget_input.replace(',', '.'))
-        if amount <= 0:
-            raise ValueError
+        amount = parse_amount(budget_input)
     except ValueError:
         await message.answer("❌ Пожалуйста, введите корректную сумму (положительное число).")
         return
@@ -318,17 +385,13 @@ async def process_budget(message: types.Message, state: FSMContext):
     current_month = datetime.now().date().replace(day=1)
     
     try:
-        conn = db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO budget (chat_id, month, amount)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (chat_id, month) 
-            DO UPDATE SET amount = EXCLUDED.amount, created_at = CURRENT_TIMESTAMP
-        """, (user_id, current_month, amount))
-        
-        conn.commit()
+        async with db.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO budget (chat_id, month, amount)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (chat_id, month) 
+                DO UPDATE SET amount = EXCLUDED.amount, created_at = CURRENT_TIMESTAMP
+            """, user_id, current_month, amount)
         
         await message.answer(
             f"✅ Бюджет на {current_month.strftime('%B %Y')} установлен: {amount:.2f} руб."
@@ -339,23 +402,13 @@ async def process_budget(message: types.Message, state: FSMContext):
         await message.answer("⚠️ Произошла ошибка при сохранении бюджета. Попробуйте снова.")
     finally:
         await state.clear()
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 # Просмотр операций с учетом бюджета
 @dp.message(Command("operations"))
 async def operations(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     try:
-        conn = db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM users WHERE chat_id = %s", (user_id,))
-        user = cursor.fetchone()
-        
-        if not user:
+        if not await registered_users.is_registered(user_id):
             await message.answer("❌ Вы не зарегистрированы. Введите команду /reg для регистрации.")
             return
         
@@ -373,11 +426,93 @@ async def operations(message: types.Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка при просмотре операций: {e}")
         await message.answer("⚠️ Произошла ошибка. Попробуйте позже.")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT):
+    # Делим текст на части не длиннее limit по границам строк; части из
+    # одних пробелов и переводов строк Telegram не принимает - пропускаем
+    chunk, size = [], 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if chunk:
+                yield from _non_blank("".join(chunk))
+                chunk, size = [], 0
+            yield from _non_blank(line[:limit])
+            line = line[limit:]
+        if size + len(line) > limit:
+            yield from _non_blank("".join(chunk))
+            chunk, size = [], 0
+        chunk.append(line)
+        size += len(line)
+    if chunk:
+        yield from _non_blank("".join(chunk))
+
+def _non_blank(chunk: str):
+    if chunk.strip():
+        yield chunk
+
+async def answer_chunked(message: types.Message, text: str, reply_markup=None, **kwargs):
+    chunks = list(split_message(text))
+    for i, chunk in enumerate(chunks):
+        markup = reply_markup if i == len(chunks) - 1 else None
+        await message.answer(chunk, reply_markup=markup, **kwargs)
+
+async def report_history(currency: str, month):
+    # Курсы за весь месяц одним запросом к серверу курсов
+    if not RATE_BY_OPERATION_DATE or currency == "RUB":
+        return None
+    month_end = (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return await rate_cache.get_history(currency, month, month_end)
+
+def render_report_page(page, currency: str, month, by_date: bool = False):
+    rate_note = ", по курсу на дату операции" if by_date else ""
+    lines = [f"📊 <b>Ваши операции за {month.strftime('%B %Y')} ({currency}{rate_note}):</b>\n"]
+    for _, date, converted_amount, op_type in page.operations:
+        lines.append(f"<i>{date}</i>: {op_type} {converted_amount} {currency}")
+
+    # Добавляем расходы
+    lines.append(f"\n<b>Итого расходов:</b> {page.total_expenses_converted} {currency}")
+
+    # Обработка бюджета
+    budget_amount = page.budget
+    if budget_amount:
+        lines.append(f"<b>Установленный бюджет:</b> {page.budget_converted} {currency}")
+        lines.append(f"<b>Остаток бюджета:</b> {page.remaining_converted} {currency}")
+
+        # Расчет процента с защитой от деления на ноль
+        if budget_amount != Decimal("0"):
+            percentage = (page.total_expenses / budget_amount * Decimal("100")).quantize(
+                Decimal("1.00"), rounding=ROUND_HALF_UP
+            )
+            percentage = min(percentage, Decimal("100.00"))  # Ограничение до 100%
+            filled = min(int(percentage) // 10, 10)  # Не больше 10 ячеек
+            progress_bar = "🟩" * filled + "⬜️" * (10 - filled)
+        else:
+            percentage = Decimal("0.00")
+            progress_bar = "[⬜️⬜️⬜️⬜️⬜️⬜️⬜️⬜️⬜️⬜️]"
+
+        lines.append(f"\n<b>Использовано:</b> {percentage}% {progress_bar}")
+    else:
+        lines.append("\nℹ️ Бюджет не установлен. Используйте /setbudget")
+
+    # Кнопки листания: курсор - первая/последняя операция на странице
+    buttons = []
+    if page.operations:
+        month_key = month.strftime('%Y-%m')
+        if page.has_prev:
+            first_id, first_date = page.operations[0][:2]
+            buttons.append(types.InlineKeyboardButton(
+                text="⬅️ Новее",
+                callback_data=f"ops:prev:{currency}:{month_key}:{first_date}:{first_id}"
+            ))
+        if page.has_next:
+            last_id, last_date = page.operations[-1][:2]
+            buttons.append(types.InlineKeyboardButton(
+                text="Старее ➡️",
+                callback_data=f"ops:next:{currency}:{month_key}:{last_date}:{last_id}"
+            ))
+    keyboard = types.InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+    return "\n".join(lines), keyboard
 
 @dp.message(OperationsChoice.waiting_for_currency)
 async def process_currency(message: types.Message, state: FSMContext):
@@ -389,102 +524,30 @@ async def process_currency(message: types.Message, state: FSMContext):
         return
 
     try:
-        with db_connection() as conn:
-            with conn.cursor() as cursor:
-                # Получаем курс валюты
-                rate = (
-                    Decimal("1.0")
-                    if currency == "RUB"
-                    else get_cached_rate(currency)
-                )
+        # Получаем курс валюты
+        rate = (
+            Decimal("1.0")
+            if currency == "RUB"
+            else await rate_cache.get(currency)
+        )
 
-                # Проверка ошибки получения курса
-                if currency != "RUB" and rate == Decimal("1.0"):
-                    await message.answer(
-                        f"⚠️ Курс {currency} недоступен. Показываю в рублях.",
-                        reply_markup=types.ReplyKeyboardRemove(),
-                    )
-                    currency = "RUB"
-                    rate = Decimal("1.0")
-
-                current_month = datetime.now().date().replace(day=1)
-
-                # Получаем бюджет
-                cursor.execute(
-                    "SELECT amount FROM budget WHERE chat_id = %s AND month = %s",
-                    (user_id, current_month),
-                )
-                budget = cursor.fetchone()
-                budget_amount = (
-                    Decimal(str(budget[0])) if budget else None
-                )
+        # Проверка ошибки получения курса
+        if rate is None:
+            await message.answer(
+                f"⚠️ Курс {currency} недоступен. Показываю в рублях.",
+                reply_markup=types.ReplyKeyboardRemove(),
+            )
+            currency = "RUB"
+            rate = Decimal("1.0")
 
-                # Получаем операции
-                cursor.execute(
-                    """SELECT date, sum, type_operation 
-                    FROM operations 
-                    WHERE chat_id = %s 
-                    AND date >= %s 
-                    AND date < %s + INTERVAL '1 month'
-                    ORDER BY date DESC""",
-                    (user_id, current_month, current_month),
-                )
-                operations = cursor.fetchall()
-
-                # Рассчитываем общие расходы
-                cursor.execute(
-                    """SELECT COALESCE(SUM(sum), 0)
-                    FROM operations
-                    WHERE chat_id = %s
-                    AND type_operation = 'РАСХОД'
-                    AND date >= %s
-                    AND date < %s + INTERVAL '1 month'""",
-                    (user_id, current_month, current_month),
-                )
-                total_expenses = Decimal(str(cursor.fetchone()[0]))
+        current_month = datetime.now().date().replace(day=1)
+        history = await report_history(currency, current_month)
 
-                # Формируем ответ
-                response_text = (
-                    f"📊 <b>Ваши операции за {current_month.strftime('%B %Y')} ({currency}):</b>\n\n"
-                )
-                for op in operations:
-                    date, amount, op_type = op
-                    converted_amount = (Decimal(str(amount)) / rate)
-                    converted_amount = converted_amount.quantize(Decimal("0.00"), rounding=ROUND_HALF_UP)
-                    response_text += f"<i>{date}</i>: {op_type} {converted_amount} {currency}\n"
-
-                # Добавляем расходы
-                total_expenses_converted = (total_expenses / rate).quantize(Decimal("0.00"), rounding=ROUND_HALF_UP)
-                response_text += f"\n<b>Итого расходов:</b> {total_expenses_converted} {currency}\n"
-
-                # Обработка бюджета
-                if budget_amount:
-                    converted_budget = (budget_amount / rate).quantize(Decimal("0.00"), rounding=ROUND_HALF_UP)
-                    remaining_budget = (budget_amount - total_expenses) / rate
-                    remaining_budget = remaining_budget.quantize(Decimal("0.00"), rounding=ROUND_HALF_UP)
-
-                    response_text += (
-                        f"<b>Установленный бюджет:</b> {converted_budget} {currency}\n"
-                        f"<b>Остаток бюджета:</b> {remaining_budget} {currency}\n"
-                    )
-
-                    # Расчет процента с защитой от деления на ноль
-                    if budget_amount != Decimal("0"):
-                        percentage = (total_expenses / budget_amount * Decimal("100")).quantize(
-                            Decimal("1.00"), rounding=ROUND_HALF_UP
-                        )
-                        percentage = min(percentage, Decimal("100.00"))  # Ограничение до 100%
-                        filled = min(int(percentage) // 10, 10)  # Не больше 10 ячеек
-                        progress_bar = "🟩" * filled + "⬜️" * (10 - filled)
-                    else:
-                        percentage = Decimal("0.00")
-                        progress_bar = "[⬜️⬜️⬜️⬜️⬜️⬜️⬜️⬜️⬜️⬜️]"
-
-                    response_text += f"\n<b>Использовано:</b> {percentage}% {progress_bar}"
-                else:
-                    response_text += "\nℹ️ Бюджет не установлен. Используйте /setbudget"
-
-                await message.answer(response_text, parse_mode="HTML")
+        async with db.acquire() as conn:
+            page = await fetch_report_page(conn, user_id, current_month, rate, history=history)
+
+        text, keyboard = render_report_page(page, currency, current_month, by_date=bool(history))
+        await answer_chunked(message, text, parse_mode="HTML", reply_markup=keyboard)
 
     except Exception as e:
         logger.error(f"Ошибка: {str(e)}", exc_info=True)
@@ -492,8 +555,83 @@ async def process_currency(message: types.Message, state: FSMContext):
     finally:
         await state.clear()
 
+# Листание отчета по операциям
+@dp.callback_query(F.data.startswith("ops:"))
+async def report_page(callback: types.CallbackQuery):
+    user_id = callback.from_user.id
+    try:
+        _, direction, currency, month_key, cursor_date, cursor_id = callback.data.split(":")
+        month = datetime.strptime(month_key, '%Y-%m').date()
+        cursor = (datetime.strptime(cursor_date, '%Y-%m-%d').date(), int(cursor_id))
+
+        rate = Decimal("1.0") if currency == "RUB" else await rate_cache.get(currency)
+        if rate is None:
+            await callback.answer(f"⚠️ Курс {currency} недоступен.", show_alert=True)
+            return
+        history = await report_history(currency, month)
+
+        async with db.acquire() as conn:
+            page = await fetch_report_page(conn, user_id, month, rate, cursor, direction, history=history)
+
+        text, keyboard = render_report_page(page, currency, month, by_date=bool(history))
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+        await callback.answer()
+
+    except Exception as e:
+        logger.error(f"Ошибка при листании операций: {e}", exc_info=True)
+        await callback.answer("⚠️ Произошла ошибка. Попробуйте позже.")
+
+# Профиль работающего бота на N секунд
+@dp.message(Command("profile"))
+async def cmd_profile(message: types.Message, command: CommandObject):
+    if message.from_user.id not in PROFILE_ADMIN_IDS:
+        await message.answer("❌ Команда доступна только администраторам.")
+        return
+    try:
+        seconds = float(command.args) if command.args else PROFILE_SECONDS
+    except ValueError:
+        await message.answer("❌ Использование: /profile [секунды]")
+        return
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+
+    await message.answer(f"⏱ Профилирую {seconds:g} сек...")
+    try:
+        path, summary = await profiler.profile(seconds, PROFILE_DIR)
+    except RuntimeError as e:
+        await message.answer(f"⚠️ {e}")
+        return
+    await message.answer_document(types.FSInputFile(path), caption="Collapsed stacks для flamegraph")
+    await answer_chunked(message, "\n".join(summary))
+
 # Запуск бота
+background_tasks = []
+
+async def on_startup():
+    await db.create_pool()
+    async with db.acquire() as conn:
+        await migrations.upgrade(conn)
+    background_tasks.append(asyncio.create_task(partitions.maintenance_loop(PARTITION_MONTHS_AHEAD)))
+    await rate_cache.start()
+    if RATE_STREAM:
+        background_tasks.append(asyncio.create_task(rate_cache.subscribe()))
+    if operation_writer is not None:
+        operation_writer.start()
+    await bot_metrics.start(BOT_METRICS_SUMMARY_INTERVAL, BOT_METRICS_PORT)
+    profiler.install_signal_handler(PROFILE_SECONDS, PROFILE_DIR)
+
+async def on_shutdown():
+    logger.info(f"Кэш регистраций: {registered_users.stats()}")
+    await bot_metrics.stop()
+    for task in background_tasks:
+        task.cancel()
+    if operation_writer is not None:
+        await operation_writer.stop()
+    await rate_cache.close()
+    await db.close_pool()
+
 async def main():
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
     await dp.start_polling(bot)
 
 if __name__ == '__main__':
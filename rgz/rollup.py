@@ -0,0 +1,86 @@
+# Помесячные итоги операций (chat_id, month, type_operation) -> total.
+# Обновляются в той же транзакции, что и INSERT в operations, поэтому
+# сумма расходов за месяц читается одной строкой независимо от истории.
+#
+# Пересчет с нуля:  python rollup.py rebuild
+import argparse
+import asyncio
+import logging
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+import asyncpg
+
+from db import DB_CONFIG
+from validation import AMOUNT_STEP
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS monthly_totals (
+        chat_id BIGINT NOT NULL,
+        month DATE NOT NULL,
+        type_operation VARCHAR(10) NOT NULL,
+        total NUMERIC NOT NULL DEFAULT 0,
+        PRIMARY KEY (chat_id, month, type_operation)
+    )
+"""
+
+
+REBUILD = """
+    DELETE FROM monthly_totals;
+    INSERT INTO monthly_totals (chat_id, month, type_operation, total)
+    SELECT chat_id, date_trunc('month', date)::date, type_operation, SUM(sum)
+    FROM operations
+    GROUP BY 1, 2, 3;
+"""
+
+
+ADD_TOTAL = """
+    INSERT INTO monthly_totals (chat_id, month, type_operation, total)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (chat_id, month, type_operation)
+    DO UPDATE SET total = monthly_totals.total + EXCLUDED.total
+"""
+
+
+async def record_operation(conn, chat_id: int, operation_date: date, amount: Decimal, operation_type: str):
+    # В итог идет та же сумма, что ляжет в operations.sum NUMERIC(12, 2)
+    amount = Decimal(amount).quantize(AMOUNT_STEP, rounding=ROUND_HALF_UP)
+    async with conn.transaction():
+        await conn.execute(
+            "INSERT INTO operations (date, sum, chat_id, type_operation) VALUES ($1, $2, $3, $4)",
+            operation_date, amount, chat_id, operation_type
+        )
+        await conn.execute(ADD_TOTAL, chat_id, operation_date.replace(day=1), operation_type, amount)
+
+
+async def add_totals(conn, totals):
+    # totals: [(chat_id, month, type_operation, sum), ...] - вызывать внутри транзакции вставки;
+    # sum - сумма уже округленных до копеек значений (validation.parse_amount)
+    await conn.executemany(ADD_TOTAL, totals)
+
+
+async def rebuild(conn):
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE operations IN SHARE MODE")
+        await conn.execute(REBUILD)
+    logger.info("Итоги по месяцам пересчитаны")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['rebuild'])
+    parser.parse_args()
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+    try:
+        await conn.execute(CREATE_TABLE)
+        await rebuild(conn)
+    finally:
+        await conn.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
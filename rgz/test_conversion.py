@@ -0,0 +1,66 @@
+import unittest
+from decimal import Decimal
+
+import conversion
+from conversion import ConversionError
+
+RATES = {'USD': Decimal('89.0625'), 'EUR': Decimal('97.5')}
+
+
+class TestConvert(unittest.TestCase):
+    def test_rounds_half_up_to_cents(self):
+        results = conversion.convert(RATES, [Decimal('1.00'), Decimal('2')], ['USD', 'RUB'], ['RUB', 'USD'])
+        self.assertEqual(results, [Decimal('89.06'), Decimal('0.02')])
+        self.assertEqual(conversion.convert({}, [Decimal('0.005')], ['RUB'], ['RUB']), [Decimal('0.01')])
+
+    def test_cross_rate(self):
+        self.assertEqual(conversion.convert(RATES, [Decimal('100')], ['EUR'], ['USD']), [Decimal('109.47')])
+
+    def test_unknown_currency(self):
+        with self.assertRaises(ConversionError) as ctx:
+            conversion.convert(RATES, [Decimal(1), Decimal(1)], ['USD', 'XXX'], ['YYY', 'RUB'])
+        self.assertEqual(ctx.exception.items, ['XXX', 'YYY'])
+
+    def test_result_out_of_range(self):
+        amounts = [Decimal(1), Decimal('90000000000000000')]
+        with self.assertRaises(ConversionError) as ctx:
+            conversion.convert(RATES, amounts, ['USD', 'USD'], ['RUB', 'RUB'])
+        self.assertEqual(ctx.exception.items, [1])
+        # Множитель, при котором quantize не помещается в точность
+        with self.assertRaises(ConversionError):
+            conversion.convert({'XXX': Decimal('1e-30')}, [Decimal(1)], ['RUB'], ['XXX'])
+
+
+class TestParseItems(unittest.TestCase):
+    def test_json_forms(self):
+        amounts, sources, targets = conversion.parse_json_items(
+            [{'amount': 0.1, 'from': 'usd', 'to': 'RUB'}, ['100.50', 'EUR', 'usd']]
+        )
+        self.assertEqual(amounts, [Decimal('0.1'), Decimal('100.50')])
+        self.assertEqual(sources, ['USD', 'EUR'])
+        self.assertEqual(targets, ['RUB', 'USD'])
+
+    def test_json_invalid_items(self):
+        items = [['1', 'USD', 'RUB'], ['x', 'USD', 'RUB'], {'amount': 1}, ['1e30', 'USD', 'RUB'], ['NaN', 'USD', 'RUB']]
+        with self.assertRaises(ConversionError) as ctx:
+            conversion.parse_json_items(items)
+        self.assertEqual(ctx.exception.items, [1, 2, 3, 4])
+        with self.assertRaises(ConversionError):
+            conversion.parse_json_items({'amount': 1})
+
+    def test_binary_round_trip(self):
+        body = conversion.BINARY_ITEM.pack(100, b'USD', b'RUB') + conversion.BINARY_ITEM.pack(-250, b'rub', b'usd')
+        amounts, sources, targets = conversion.parse_binary_items(body)
+        self.assertEqual(amounts, [Decimal('1.00'), Decimal('-2.50')])
+        self.assertEqual(sources, ['USD', 'RUB'])
+        results = conversion.convert(RATES, amounts, sources, targets)
+        packed = conversion.pack_binary_results(results)
+        self.assertEqual([v for (v,) in conversion.BINARY_RESULT.iter_unpack(packed)], [8906, -3])
+
+    def test_binary_bad_length(self):
+        with self.assertRaises(ConversionError):
+            conversion.parse_binary_items(b'\0' * 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
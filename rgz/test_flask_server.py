@@ -0,0 +1,84 @@
+import os
+import unittest
+from datetime import date, timedelta
+
+# Ключ до импорта: flask_server читает его при загрузке
+os.environ.setdefault('FLASK_API_KEY', 'test-key')
+os.environ['RATES_PROVIDER'] = 'static'
+os.environ.pop('RATES_HISTORY_FILE', None)
+
+import flask_server
+
+
+class TestRatesCaching(unittest.TestCase):
+    def setUp(self):
+        self.client = flask_server.app.test_client()
+        self.headers = {'X-API-KEY': flask_server.API_KEY}
+        self.refresher = flask_server.rate_refresher
+        self.saved_rates = dict(self.refresher.provider.rates)
+        self.addCleanup(self.restore_rates)
+
+    def restore_rates(self):
+        self.refresher.provider.rates = self.saved_rates
+        self.refresher.refresh_once()
+
+    def set_rates(self, **rates):
+        self.refresher.provider.rates = dict(self.saved_rates, **rates)
+        self.assertTrue(self.refresher.refresh_once())
+
+    def get(self, url, etag=None):
+        headers = dict(self.headers)
+        if etag:
+            headers['If-None-Match'] = f'"{etag}"'
+        return self.client.get(url, headers=headers)
+
+    def test_rates_etag_and_304(self):
+        first = self.get('/rates')
+        self.assertEqual(first.status_code, 200)
+        etag = first.get_etag()[0]
+        self.assertEqual(etag, first.get_json()['version'])
+        self.assertIn('max-age', first.headers['Cache-Control'])
+
+        cached = self.get('/rates', etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.data, b'')
+        self.assertEqual(cached.get_etag()[0], etag)
+
+        self.set_rates(USD=self.saved_rates['USD'] + 1)
+        changed = self.get('/rates', etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.get_etag()[0], etag)
+        self.assertEqual(changed.get_json()['rates']['USD'], self.saved_rates['USD'] + 1)
+
+    def test_subset_etag_ignores_other_currencies(self):
+        first = self.get('/rates?currencies=usd')
+        self.assertEqual(first.get_json()['rates'], {'USD': self.saved_rates['USD']})
+        etag = first.get_etag()[0]
+        # Изменение EUR не меняет версию ответа только с USD
+        self.set_rates(EUR=self.saved_rates['EUR'] + 1)
+        self.assertEqual(self.get('/rates?currencies=USD', etag).status_code, 304)
+        self.set_rates(USD=self.saved_rates['USD'] + 1)
+        self.assertEqual(self.get('/rates?currencies=USD', etag).status_code, 200)
+        self.assertEqual(self.get('/rates?currencies=USD,XXX').status_code, 400)
+
+    def test_history_etag_and_304(self):
+        today = date.today()
+        url = f'/rates/history?from={today - timedelta(days=7)}&to={today}&currencies=USD'
+        first = self.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first.get_etag()[0]
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+        # Новый курс за сегодня попадает в историю и меняет версию
+        self.set_rates(USD=self.saved_rates['USD'] + 2)
+        changed = self.get(url, etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.get_etag()[0], etag)
+        self.assertEqual(changed.get_json()['history']['USD'][-1][1], self.saved_rates['USD'] + 2)
+
+    def test_requires_api_key(self):
+        self.assertEqual(self.client.get('/rates').status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
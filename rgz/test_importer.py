@@ -0,0 +1,185 @@
+import io
+import tempfile
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+import asyncpg
+
+import importer
+import migrations
+from importer import ImportResult, import_operations, read_csv_rows, read_xlsx_rows
+from test_reports import throwaway_config
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+CHAT_ID = 43
+
+
+def records(rows):
+    result = ImportResult()
+    return list(importer._records(rows, CHAT_ID, result)), result
+
+
+class TestReadRows(unittest.TestCase):
+    def test_csv_dialect_is_sniffed(self):
+        for delimiter in [',', ';', '\t']:
+            with self.subTest(delimiter=delimiter):
+                text = f"дата{delimiter}сумма{delimiter}тип\n2026-03-01{delimiter}100.5{delimiter}РАСХОД\n"
+                self.assertEqual(list(read_csv_rows(io.BytesIO(text.encode()))),
+                                 [['дата', 'сумма', 'тип'], ['2026-03-01', '100.5', 'РАСХОД']])
+        # Десятичная запятая в файле с ';' не принимается за разделитель
+        rows = list(read_csv_rows(io.BytesIO("2026-03-01;100,5;РАСХОД\n2026-03-02;7,25;ДОХОД\n".encode())))
+        self.assertEqual(rows, [['2026-03-01', '100,5', 'РАСХОД'], ['2026-03-02', '7,25', 'ДОХОД']])
+
+    def test_csv_bom_and_single_column(self):
+        # BOM из Excel не попадает в первую ячейку; без разделителей - диалект по умолчанию
+        rows = list(read_csv_rows(io.BytesIO("\ufeff2026-03-01;10;ДОХОД\n".encode())))
+        self.assertEqual(rows, [['2026-03-01', '10', 'ДОХОД']])
+        self.assertEqual(list(read_csv_rows(io.BytesIO(b"2026-03-01\n"))), [['2026-03-01']])
+
+    @unittest.skipIf(openpyxl is None, "нет openpyxl")
+    def test_xlsx_cells(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['Дата', 'Сумма', 'Тип'])
+        sheet.append([datetime(2026, 3, 1), 100.5, 'расход'])
+        sheet.append([None, None, None])
+        sheet.append(['2026-03-02', 7, 'ДОХОД'])
+        buf = io.BytesIO()
+        workbook.save(buf)
+        buf.seek(0)
+
+        operations, result = records(read_xlsx_rows(buf))
+        self.assertEqual(operations, [
+            (date(2026, 3, 1), Decimal('100.50'), CHAT_ID, 'РАСХОД'),
+            (date(2026, 3, 2), Decimal('7.00'), CHAT_ID, 'ДОХОД'),
+        ])
+        self.assertEqual((result.accepted, result.rejected), (2, 0))
+
+
+class TestRecords(unittest.TestCase):
+    def test_header_is_skipped_only_on_first_line(self):
+        operations, result = records([['date', 'sum', 'type'], ['2026-03-01', '10', 'РАСХОД'], ['date', 'sum', 'type']])
+        self.assertEqual(len(operations), 1)
+        self.assertEqual(result.errors, ["строка 3: некорректная дата: date"])
+
+        # Первая строка с датой - не заголовок, а ошибочная операция
+        operations, result = records([['2026-03-01', 'много', 'РАСХОД']])
+        self.assertEqual(operations, [])
+        self.assertEqual(result.errors, ["строка 1: некорректная сумма: много"])
+
+    def test_rejection_reasons(self):
+        rows = [
+            ['2026-03-01', '10'],
+            ['01.03.2026', '10', 'РАСХОД'],
+            ['2026-03-01', '-5', 'РАСХОД'],
+            ['2026-03-01', '10000000000', 'РАСХОД'],
+            ['2026-03-01', '10', 'перевод'],
+            ['', '', ''],
+            [],
+            None,
+            ['2026-03-31', '0,005', 'доход'],
+        ]
+        operations, result = records(rows)
+        self.assertEqual(operations, [(date(2026, 3, 31), Decimal('0.01'), CHAT_ID, 'ДОХОД')])
+        # Пустые строки пропускаются без ошибок, но учитываются в нумерации
+        self.assertEqual(result.errors, [
+            "строка 1: ожидается 3 колонки: дата, сумма, тип",
+            "строка 2: некорректная дата: 01.03.2026",
+            "строка 3: некорректная сумма: -5",
+            "строка 4: некорректная сумма: 10000000000",
+            "строка 5: неизвестный тип операции: перевод",
+        ])
+        self.assertEqual((result.accepted, result.rejected), (1, 5))
+
+    def test_totals_and_error_limit(self):
+        rows = [['2026-03-01', '1.25', 'РАСХОД'], ['2026-03-31', '2.50', 'РАСХОД'], ['2026-04-01', '3', 'РАСХОД']]
+        rows += [['2026-03-01', 'x', 'РАСХОД']] * (importer.MAX_REPORTED_ERRORS + 5)
+        operations, result = records(rows)
+        self.assertEqual(len(operations), 3)
+        self.assertEqual(dict(result.totals), {
+            (date(2026, 3, 1), 'РАСХОД'): Decimal('3.75'),
+            (date(2026, 4, 1), 'РАСХОД'): Decimal('3.00'),
+        })
+        self.assertEqual(result.rejected, importer.MAX_REPORTED_ERRORS + 5)
+        self.assertEqual(len(result.errors), importer.MAX_REPORTED_ERRORS)
+
+
+class TestImportOperations(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp(prefix='rgz-pg-')
+        cls.config, cls.server = throwaway_config(cls.tmpdir)
+        if cls.config is None:
+            raise unittest.SkipTest("нет pgserver и RGZ_TEST_DB_HOST")
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.server is not None:
+            cls.server.cleanup()
+
+    async def asyncSetUp(self):
+        self.conn = await asyncpg.connect(**self.config)
+        await migrations.upgrade(self.conn)
+        await self.conn.execute("DELETE FROM operations WHERE chat_id = $1", CHAT_ID)
+        await self.conn.execute("DELETE FROM monthly_totals WHERE chat_id = $1", CHAT_ID)
+        await self.conn.execute(
+            "INSERT INTO monthly_totals (chat_id, month, type_operation, total) VALUES ($1, '2026-03-01', 'РАСХОД', 100)",
+            CHAT_ID
+        )
+
+    async def asyncTearDown(self):
+        await self.conn.close()
+
+    async def totals(self):
+        rows = await self.conn.fetch(
+            "SELECT month, type_operation, total FROM monthly_totals WHERE chat_id = $1 ORDER BY month, type_operation",
+            CHAT_ID
+        )
+        return [tuple(row) for row in rows]
+
+    async def test_copy_and_monthly_totals(self):
+        rows = [
+            ['Дата', 'Сумма', 'Тип'],
+            ['2026-03-01', '10,005', 'РАСХОД'],
+            ['2026-03-15', '5', 'ДОХОД'],
+            ['2026-04-01', '2.5', 'расход'],
+            ['2026-03-02', 'x', 'РАСХОД'],
+        ]
+        result = await import_operations(self.conn, CHAT_ID, rows)
+        self.assertEqual((result.accepted, result.rejected), (3, 1))
+
+        stored = await self.conn.fetch(
+            "SELECT date, sum, type_operation FROM operations WHERE chat_id = $1 ORDER BY date", CHAT_ID
+        )
+        self.assertEqual([tuple(row) for row in stored], [
+            (date(2026, 3, 1), Decimal('10.01'), 'РАСХОД'),
+            (date(2026, 3, 15), Decimal('5.00'), 'ДОХОД'),
+            (date(2026, 4, 1), Decimal('2.50'), 'РАСХОД'),
+        ])
+        # Итоги дополняют уже существующие и совпадают с суммой строк
+        self.assertEqual(await self.totals(), [
+            (date(2026, 3, 1), 'ДОХОД', Decimal('5.00')),
+            (date(2026, 3, 1), 'РАСХОД', Decimal('110.01')),
+            (date(2026, 4, 1), 'РАСХОД', Decimal('2.50')),
+        ])
+
+    async def test_failure_rolls_back_rows_and_totals(self):
+        # Ошибка чтения посреди COPY откатывает и строки, и итоги
+        def rows():
+            yield ['2026-03-01', '10', 'РАСХОД']
+            yield ['2026-03-02', '20', 'РАСХОД']
+            raise OSError("файл оборван")
+
+        with self.assertRaises(OSError):
+            await import_operations(self.conn, CHAT_ID, rows())
+        self.assertEqual(await self.conn.fetchval("SELECT count(*) FROM operations WHERE chat_id = $1", CHAT_ID), 0)
+        self.assertEqual(await self.totals(), [(date(2026, 3, 1), 'РАСХОД', Decimal('100'))])
+
+
+if __name__ == '__main__':
+    unittest.main()
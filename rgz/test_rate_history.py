@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from rate_history import RateHistory
+
+
+class TestRateLookup(unittest.TestCase):
+    def setUp(self):
+        self.history = RateHistory()
+        for day, rate in [(date(2026, 3, 1), 90.0), (date(2026, 3, 5), 91.0), (date(2026, 3, 10), 92.0)]:
+            self.history.set_rate('USD', day, rate)
+
+    def test_rate_on_is_last_point_not_after_day(self):
+        self.assertIsNone(self.history.rate_on('USD', date(2026, 2, 28)))
+        self.assertEqual(self.history.rate_on('USD', date(2026, 3, 1)), 90.0)
+        self.assertEqual(self.history.rate_on('USD', date(2026, 3, 4)), 90.0)
+        self.assertEqual(self.history.rate_on('USD', date(2026, 3, 5)), 91.0)
+        self.assertEqual(self.history.rate_on('USD', date(2027, 1, 1)), 92.0)
+        self.assertIsNone(self.history.rate_on('EUR', date(2026, 3, 5)))
+
+    def test_between_includes_rate_in_force_at_start(self):
+        self.assertEqual(self.history.between('USD', date(2026, 3, 3), date(2026, 3, 10)), [
+            (date(2026, 3, 1), 90.0), (date(2026, 3, 5), 91.0), (date(2026, 3, 10), 92.0)
+        ])
+        self.assertEqual(self.history.between('USD', date(2026, 3, 5), date(2026, 3, 9)), [(date(2026, 3, 5), 91.0)])
+        # Период до первой точки - с первой точкой, действующей и раньше
+        self.assertEqual(self.history.between('USD', date(2026, 1, 1), date(2026, 1, 31)), [])
+        self.assertEqual(self.history.between('EUR', date(2026, 1, 1), date(2026, 12, 31)), [])
+
+    def test_set_rate_reports_changes(self):
+        self.assertFalse(self.history.set_rate('USD', date(2026, 3, 5), 91.0))
+        self.assertTrue(self.history.set_rate('USD', date(2026, 3, 5), 91.5))
+        self.assertTrue(self.history.set_rate('USD', date(2026, 3, 3), 90.5))
+        self.assertEqual(self.history.rate_on('USD', date(2026, 3, 4)), 90.5)
+        self.assertEqual(self.history.rate_on('USD', date(2026, 3, 6)), 91.5)
+
+
+class TestRateHistoryFile(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'history.json')
+
+    def writer(self) -> RateHistory:
+        history = RateHistory(self.path)
+        self.addCleanup(lambda: history._lock_file and history._lock_file.close())
+        return history
+
+    def snapshot(self, day: date, rates: dict):
+        return SimpleNamespace(updated_at=datetime.combine(day, datetime.min.time()), rates=rates)
+
+    def test_record_saves_and_load_restores(self):
+        history = self.writer()
+        history.record(self.snapshot(date(2026, 3, 1), {'USD': 90.0, 'EUR': 100.0}))
+        history.record(self.snapshot(date(2026, 3, 2), {'USD': 91.0, 'EUR': 100.0}))
+
+        restored = RateHistory(self.path)
+        self.assertEqual(restored.currencies(), ['EUR', 'USD'])
+        self.assertEqual(restored.between('USD', date(2026, 3, 1), date(2026, 3, 31)),
+                         history.between('USD', date(2026, 3, 1), date(2026, 3, 31)))
+        # Временные файлы не остаются рядом
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ['history.json', 'history.json.lock'])
+
+    def test_unchanged_snapshot_does_not_rewrite_file(self):
+        history = self.writer()
+        history.record(self.snapshot(date(2026, 3, 1), {'USD': 90.0}))
+        mtime = os.stat(self.path).st_mtime_ns
+        os.utime(self.path, ns=(0, 0))
+        history.record(self.snapshot(date(2026, 3, 1), {'USD': 90.0}))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+        self.assertNotEqual(mtime, 0)
+
+    def test_single_writer(self):
+        # Второй процесс (воркер) с тем же файлом ведет историю только в памяти
+        writer = self.writer()
+        other = self.writer()
+        writer.record(self.snapshot(date(2026, 3, 1), {'USD': 90.0}))
+        other.record(self.snapshot(date(2026, 3, 2), {'USD': 91.0}))
+        self.assertEqual(other.rate_on('USD', date(2026, 3, 2)), 91.0)
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'USD': [['2026-03-01', 90.0]]})
+
+        # Писатель завершился - блокировку забирает следующий сохраняющий
+        writer._lock_file.close()
+        other.record(self.snapshot(date(2026, 3, 3), {'USD': 92.0}))
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'USD': [['2026-03-02', 91.0], ['2026-03-03', 92.0]]})
+
+    def test_save_replaces_file_atomically(self):
+        # Файл подменяется целиком: открытый до записи читатель видит старую версию
+        history = RateHistory()
+        history.set_rate('USD', date(2026, 3, 1), 90.0)
+        history.save(self.path)
+        with open(self.path, encoding='utf-8') as reader:
+            history.set_rate('USD', date(2026, 3, 2), 91.0)
+            history.save(self.path)
+            self.assertEqual(json.load(reader), {'USD': [['2026-03-01', 90.0]]})
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)['USD']), 2)
+
+    def test_failed_save_keeps_previous_file(self):
+        history = RateHistory()
+        history.set_rate('USD', date(2026, 3, 1), 90.0)
+        history.save(self.path)
+        history.set_rate('USD', date(2026, 3, 2), 91.0)
+
+        def write_half(data, f):
+            f.write('{"USD": [')
+            raise OSError("диск заполнен")
+
+        with mock.patch('rate_history.json.dump', side_effect=write_half):
+            with self.assertRaises(OSError):
+                history.save(self.path)
+        self.assertEqual(RateHistory(self.path).between('USD', date(2026, 3, 1), date(2026, 3, 31)),
+                         [(date(2026, 3, 1), 90.0)])
+        self.assertEqual(os.listdir(self.dir.name), ['history.json'])
+
+    def test_corrupt_file_is_moved_aside(self):
+        for content in ['{"USD": [["2026-03-0', '[1, 2]', '{"USD": [["not a date", 1]]}']:
+            with self.subTest(content=content):
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                with self.assertLogs('rate_history', 'ERROR'):
+                    history = RateHistory(self.path)
+                self.assertEqual(history.currencies(), [])
+                self.assertFalse(os.path.exists(self.path))
+                with open(self.path + '.corrupt', encoding='utf-8') as f:
+                    self.assertEqual(f.read(), content)
+
+    def test_missing_file_starts_empty(self):
+        self.assertEqual(RateHistory(self.path).currencies(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
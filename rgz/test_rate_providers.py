@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer
+
+import fake_rates_upstream
+from rate_providers import FileProvider, HttpProvider, RateRefresher, StaticProvider
+
+
+class FakeUpstream:
+    # fake_rates_upstream.py на свободном порту в отдельном потоке
+    def __enter__(self):
+        self.saved_rates = dict(fake_rates_upstream.rates)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), fake_rates_upstream.Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        fake_rates_upstream.rates.clear()
+        fake_rates_upstream.rates.update(self.saved_rates)
+
+
+class TestRefresh(unittest.TestCase):
+    def test_http_refresh_swaps_snapshot_and_version(self):
+        with FakeUpstream() as upstream:
+            refresher = RateRefresher(HttpProvider(upstream.url + '/rates', timeout=2))
+            self.assertTrue(refresher.refresh_once())
+            first = refresher.snapshot
+            self.assertEqual(dict(first.rates), fake_rates_upstream.rates)
+
+            # Те же курсы - снимок не меняется
+            self.assertTrue(refresher.refresh_once())
+            self.assertIs(refresher.snapshot, first)
+
+            fake_rates_upstream.rates['USD'] = 80.0
+            seen = []
+            refresher.listeners.append(seen.append)
+            self.assertTrue(refresher.refresh_once())
+            self.assertEqual(refresher.snapshot.rates['USD'], 80.0)
+            self.assertNotEqual(refresher.snapshot.version, first.version)
+            self.assertEqual(seen, [refresher.snapshot])
+            # Старый снимок не изменился - читатели видят его целиком
+            self.assertNotEqual(first.rates['USD'], 80.0)
+
+    def test_failed_refresh_keeps_previous_snapshot(self):
+        with FakeUpstream() as upstream:
+            refresher = RateRefresher(HttpProvider(upstream.url + '/rates', timeout=2))
+            refresher.refresh_once()
+            snapshot = refresher.snapshot
+            refresher.provider = HttpProvider(upstream.url + '/missing', timeout=2)  # 404
+            with self.assertLogs('rate_providers', 'ERROR'):
+                self.assertFalse(refresher.refresh_once())
+            self.assertIs(refresher.snapshot, snapshot)
+
+    def test_bad_data_keeps_previous_snapshot(self):
+        refresher = RateRefresher(StaticProvider({'USD': 90}))
+        refresher.refresh_once()
+        snapshot = refresher.snapshot
+        for bad in ({}, {'USD': 'abc', 'EUR': -1, 'CNY': None}):
+            refresher.provider = StaticProvider(bad)
+            with self.assertLogs('rate_providers', 'ERROR'):
+                self.assertFalse(refresher.refresh_once())
+            self.assertIs(refresher.snapshot, snapshot)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'rates.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('{"rates": {"USD": 9')
+            refresher.provider = FileProvider(path)
+            with self.assertLogs('rate_providers', 'ERROR'):
+                self.assertFalse(refresher.refresh_once())
+            self.assertIs(refresher.snapshot, snapshot)
+
+            # Отдельные плохие курсы отбрасываются, хорошие принимаются
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'rates': {'usd': 91, 'EUR': 'x'}}, f)
+            self.assertTrue(refresher.refresh_once())
+            self.assertEqual(dict(refresher.snapshot.rates), {'USD': 91.0})
+
+
+class TestWaitForChange(unittest.TestCase):
+    def test_times_out_without_change(self):
+        refresher = RateRefresher(StaticProvider({'USD': 90}), initial={'USD': 90})
+        start = time.monotonic()
+        self.assertIsNone(refresher.wait_for_change(refresher.snapshot.version, timeout=0.1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_returns_immediately_for_stale_version(self):
+        refresher = RateRefresher(StaticProvider({'USD': 90}), initial={'USD': 90})
+        self.assertIs(refresher.wait_for_change('old', timeout=5), refresher.snapshot)
+        self.assertIs(refresher.wait_for_change(None, timeout=5), refresher.snapshot)
+
+    def test_wakes_up_on_refresh(self):
+        provider = StaticProvider({'USD': 90})
+        refresher = RateRefresher(provider, initial={'USD': 90})
+        version = refresher.snapshot.version
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(refresher.wait_for_change(version, timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        provider.rates['USD'] = 95
+        refresher.refresh_once()
+        waiter.join(2)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(result[0].rates['USD'], 95.0)
+
+    def test_background_thread_refreshes(self):
+        provider = StaticProvider({'USD': 90})
+        refresher = RateRefresher(provider, interval=0.02)
+        refresher.start()
+        self.addCleanup(refresher.stop)
+        version = refresher.snapshot.version
+        provider.rates['USD'] = 91
+        snapshot = refresher.wait_for_change(version, timeout=2)
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(snapshot.rates['USD'], 91.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
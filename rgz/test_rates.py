@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from decimal import Decimal
+
+from aiohttp import web
+
+from rates import RateCache
+
+
+class FakeRateServer:
+    # Локальный /rate: считает запросы, может отвечать с задержкой или ошибкой
+    def __init__(self):
+        self.rates = {'USD': '90.5'}
+        self.status = 200
+        self.delay = 0
+        self.requests = 0
+
+    async def handle_rate(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.json_response({'error': 'unavailable'}, status=self.status)
+        currency = request.query['currency']
+        if currency not in self.rates:
+            return web.json_response({'error': 'Unknown currency'}, status=404)
+        return web.json_response({'currency': currency, 'rate': float(self.rates[currency])})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/rate', self.handle_rate)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class TestRateCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeRateServer()
+        self.url = await self.server.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+        await self.server.stop()
+
+    def make_cache(self, **kwargs):
+        self.cache = RateCache(self.url, **kwargs)
+        return self.cache
+
+    async def test_concurrent_requests_are_coalesced(self):
+        cache = self.make_cache()
+        self.server.delay = 0.1
+        results = await asyncio.gather(*(cache.get('usd') for _ in range(20)))
+        self.assertEqual(results, [Decimal('90.5')] * 20)
+        self.assertEqual(self.server.requests, 1)
+        # Свежее значение - из кэша
+        self.assertEqual(await cache.get('USD'), Decimal('90.5'))
+        self.assertEqual(self.server.requests, 1)
+
+    async def test_cancelled_caller_does_not_cancel_shared_request(self):
+        cache = self.make_cache()
+        self.server.delay = 0.1
+        first = asyncio.create_task(cache.get('USD'))
+        second = asyncio.create_task(cache.get('USD'))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        self.assertEqual(await second, Decimal('90.5'))
+        self.assertEqual(self.server.requests, 1)
+
+    async def test_negative_ttl(self):
+        cache = self.make_cache(negative_ttl=0.1)
+        self.assertIsNone(await cache.get('XXX'))
+        self.assertIsNone(await cache.get('XXX'))
+        self.assertEqual(self.server.requests, 1)
+        # После negative_ttl - новая попытка
+        self.server.rates['XXX'] = '1.5'
+        await asyncio.sleep(0.15)
+        self.assertEqual(await cache.get('XXX'), Decimal('1.5'))
+        self.assertEqual(self.server.requests, 2)
+
+    async def test_stale_while_revalidate(self):
+        cache = self.make_cache(ttl=0.05, stale_ttl=10)
+        self.assertEqual(await cache.get('USD'), Decimal('90.5'))
+        self.server.rates['USD'] = '91'
+        self.server.delay = 0.1
+        await asyncio.sleep(0.06)
+        # Устаревшее значение отдается сразу, обновление идет в фоне
+        self.assertEqual(await asyncio.wait_for(cache.get('USD'), 0.05), Decimal('90.5'))
+        await asyncio.sleep(0.15)
+        self.assertEqual(await cache.get('USD'), Decimal('91'))
+        self.assertEqual(self.server.requests, 2)
+
+    async def test_server_error_keeps_stale_value(self):
+        cache = self.make_cache(ttl=0.05, stale_ttl=10, negative_ttl=0.1)
+        self.assertEqual(await cache.get('USD'), Decimal('90.5'))
+        self.server.status = 500
+        await asyncio.sleep(0.06)
+        self.assertEqual(await cache.get('USD'), Decimal('90.5'))
+        await asyncio.sleep(0.01)
+        requests = self.server.requests
+        # Пока действует negative_ttl, сервер не опрашивается
+        self.assertEqual(await cache.get('USD'), Decimal('90.5'))
+        self.assertEqual(self.server.requests, requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
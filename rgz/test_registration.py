@@ -0,0 +1,105 @@
+import unittest
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import db
+from registration import RegistrationCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeUsers:
+    # Таблица users в памяти; считает запросы к "базе"
+    def __init__(self):
+        self.names = {}
+        self.queries = 0
+
+    async def fetchval(self, query, chat_id):
+        self.queries += 1
+        return self.names.get(chat_id)
+
+
+class TestRegistrationCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.users = FakeUsers()
+
+        @asynccontextmanager
+        async def acquire():
+            yield self.users
+
+        patcher = mock.patch.object(db, 'acquire', acquire)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+
+    def make_cache(self, **kwargs):
+        return RegistrationCache(clock=self.clock, **kwargs)
+
+    async def test_registered_user_hits_cache(self):
+        cache = self.make_cache()
+        self.users.names[1] = 'alice'
+        self.assertEqual(await cache.get_name(1), 'alice')
+        self.assertTrue(await cache.is_registered(1))
+        self.assertEqual(self.users.queries, 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    async def test_lru_eviction(self):
+        cache = self.make_cache(max_size=2)
+        cache.add(1, 'a')
+        cache.add(2, 'b')
+        await cache.get_name(1)  # 1 становится самым свежим
+        cache.add(3, 'c')        # вытесняется 2
+        self.assertEqual(cache.stats()['registered'], 2)
+        self.users.names.update({1: 'a', 2: 'b', 3: 'c'})
+        self.assertEqual(await cache.get_name(1), 'a')
+        self.assertEqual(await cache.get_name(3), 'c')
+        self.assertEqual(self.users.queries, 0)
+        self.assertEqual(await cache.get_name(2), 'b')
+        self.assertEqual(self.users.queries, 1)
+
+    async def test_negative_ttl(self):
+        cache = self.make_cache(negative_ttl=30)
+        self.assertIsNone(await cache.get_name(1))
+        self.users.names[1] = 'alice'  # регистрация в другом процессе
+        self.clock.now += 29
+        self.assertIsNone(await cache.get_name(1))
+        self.assertEqual(self.users.queries, 1)
+        self.clock.now += 2
+        self.assertEqual(await cache.get_name(1), 'alice')
+        self.assertEqual(self.users.queries, 2)
+
+    async def test_negative_entries_are_bounded(self):
+        cache = self.make_cache(max_size=3, negative_ttl=30)
+        for chat_id in range(10):
+            await cache.get_name(chat_id)
+            self.assertLessEqual(cache.stats()['unregistered'], 3)
+
+    async def test_add_on_reg_replaces_negative_entry(self):
+        cache = self.make_cache()
+        self.assertFalse(await cache.is_registered(1))
+        cache.add(1, 'alice')
+        self.assertTrue(await cache.is_registered(1))
+        self.assertEqual(self.users.queries, 1)
+
+    async def test_invalidate_on_start(self):
+        cache = self.make_cache()
+        self.assertFalse(await cache.is_registered(1))
+        self.users.names[1] = 'alice'
+        cache.invalidate(1)
+        self.assertTrue(await cache.is_registered(1))
+        # Удаление пользователя из базы видно после invalidate
+        del self.users.names[1]
+        cache.invalidate(1)
+        self.assertFalse(await cache.is_registered(1))
+        self.assertEqual(self.users.queries, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+
+import asyncpg
+
+import migrations
+from reports import fetch_report_page
+
+try:
+    import pgserver
+except ImportError:
+    pgserver = None
+
+CHAT_ID = 42
+MONTH = date(2026, 3, 1)
+
+
+# Тест поднимает одноразовый Postgres через pgserver (pip install pgserver)
+# или использует базу из RGZ_TEST_DB_HOST/PORT/USER/PASSWORD/NAME
+def throwaway_config(tmpdir):
+    if os.getenv('RGZ_TEST_DB_HOST'):
+        return {
+            'host': os.getenv('RGZ_TEST_DB_HOST'),
+            'port': int(os.getenv('RGZ_TEST_DB_PORT', '5432')),
+            'user': os.getenv('RGZ_TEST_DB_USER', 'postgres'),
+            'password': os.getenv('RGZ_TEST_DB_PASSWORD', 'postgres'),
+            'database': os.getenv('RGZ_TEST_DB_NAME', 'postgres'),
+        }, None
+    if pgserver is None:
+        return None, None
+    server = pgserver.get_server(tmpdir, cleanup_mode='delete')
+    return {'host': tmpdir, 'user': 'postgres', 'database': 'postgres'}, server
+
+
+class TestReportPaging(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp(prefix='rgz-pg-')
+        cls.config, cls.server = throwaway_config(cls.tmpdir)
+        if cls.config is None:
+            raise unittest.SkipTest("нет pgserver и RGZ_TEST_DB_HOST")
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.server is not None:
+            cls.server.cleanup()
+
+    async def asyncSetUp(self):
+        self.conn = await asyncpg.connect(**self.config)
+        await migrations.upgrade(self.conn)
+        await self.conn.execute("DELETE FROM operations WHERE chat_id = $1", CHAT_ID)
+        await self.conn.execute("DELETE FROM monthly_totals WHERE chat_id = $1", CHAT_ID)
+        await self.conn.execute("DELETE FROM budget WHERE chat_id = $1", CHAT_ID)
+        # 7 операций: по две на 1-3 марта (одинаковая дата - порядок по id),
+        # одна 4 марта; плюс операции соседних месяцев, не попадающие в отчет
+        days = [1, 1, 2, 2, 3, 3, 4]
+        for i, day in enumerate(days):
+            await self.conn.execute(
+                "INSERT INTO operations (date, sum, chat_id, type_operation) VALUES ($1, $2, $3, 'РАСХОД')",
+                MONTH.replace(day=day), Decimal(i + 1), CHAT_ID
+            )
+        for other in (MONTH - timedelta(days=1), date(2026, 4, 1)):
+            await self.conn.execute(
+                "INSERT INTO operations (date, sum, chat_id, type_operation) VALUES ($1, 100, $2, 'РАСХОД')",
+                other, CHAT_ID
+            )
+        await self.conn.execute(
+            "INSERT INTO monthly_totals (chat_id, month, type_operation, total) VALUES ($1, $2, 'РАСХОД', 28)",
+            CHAT_ID, MONTH
+        )
+        # Ключи (date, id) всех операций месяца от новых к старым
+        self.expected = [
+            (row['date'], row['id']) for row in await self.conn.fetch("""
+                SELECT id, date FROM operations
+                WHERE chat_id = $1 AND date >= $2 AND date < $2::date + INTERVAL '1 month'
+                ORDER BY date DESC, id DESC
+            """, CHAT_ID, MONTH)
+        ]
+
+    async def asyncTearDown(self):
+        await self.conn.close()
+
+    async def page(self, cursor=None, direction='next'):
+        return await fetch_report_page(self.conn, CHAT_ID, MONTH, Decimal(1), cursor, direction, page_size=3)
+
+    def keys(self, page):
+        return [(op_date, op_id) for op_id, op_date, _, _ in page.operations]
+
+    async def test_walk_forward_and_back(self):
+        first = await self.page()
+        self.assertEqual(self.keys(first), self.expected[0:3])
+        self.assertEqual((first.has_prev, first.has_next), (False, True))
+
+        # Курсоры (date, id) - как у кнопок: последняя операция для "next", первая для "prev"
+        second = await self.page(self.keys(first)[-1], 'next')
+        self.assertEqual(self.keys(second), self.expected[3:6])
+        self.assertEqual((second.has_prev, second.has_next), (True, True))
+
+        last = await self.page(self.keys(second)[-1], 'next')
+        self.assertEqual(self.keys(last), self.expected[6:])
+        self.assertEqual((last.has_prev, last.has_next), (True, False))
+
+        back = await self.page(self.keys(last)[0], 'prev')
+        self.assertEqual(self.keys(back), self.expected[3:6])
+        self.assertEqual((back.has_prev, back.has_next), (True, True))
+
+        front = await self.page(self.keys(back)[0], 'prev')
+        self.assertEqual(self.keys(front), self.expected[0:3])
+        self.assertEqual((front.has_prev, front.has_next), (False, True))
+
+    async def test_exact_page_boundary(self):
+        # Ровно page_size операций после курсора - кнопки "дальше" нет
+        page = await self.page(self.expected[3], 'next')
+        self.assertEqual(self.keys(page), self.expected[4:7])
+        self.assertFalse(page.has_next)
+
+    async def test_totals_and_conversion(self):
+        await self.conn.execute(
+            "INSERT INTO budget (chat_id, month, amount) VALUES ($1, $2, 100)", CHAT_ID, MONTH
+        )
+        page = await fetch_report_page(self.conn, CHAT_ID, MONTH, Decimal(3), page_size=3)
+        self.assertEqual(page.total_expenses, Decimal(28))
+        self.assertEqual(page.total_expenses_converted, Decimal('9.33'))
+        self.assertEqual(page.budget_converted, Decimal('33.33'))
+        self.assertEqual(page.remaining_converted, Decimal('24.00'))
+        # Сумма 7 / 3 = 2.333... -> 2.33
+        self.assertEqual(page.operations[0][2], Decimal('2.33'))
+
+    async def test_empty_month(self):
+        page = await fetch_report_page(self.conn, CHAT_ID, date(2020, 1, 1), Decimal(1))
+        self.assertEqual(page.operations, [])
+        self.assertEqual((page.has_prev, page.has_next), (False, False))
+        self.assertEqual(page.total_expenses, Decimal(0))
+        self.assertIsNone(page.budget)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import os
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Модули, которые правятся в rgz и копируются в другие лабораторные
+SHARED = {
+    'metrics.py': ['laba4', 'laba5'],
+    'bot_metrics.py': ['laba4', 'laba5'],
+    'profiler.py': ['laba5'],
+}
+
+
+class TestSharedCopies(unittest.TestCase):
+    def test_copies_match_rgz(self):
+        for name, labs in SHARED.items():
+            with open(os.path.join(HERE, name), 'rb') as f:
+                source = f.read()
+            for lab in labs:
+                copy_path = os.path.join(ROOT, lab, name)
+                with self.subTest(copy=f"{lab}/{name}"):
+                    with open(copy_path, 'rb') as f:
+                        self.assertTrue(f.read() == source, f"{lab}/{name} отличается от rgz/{name}: cp rgz/{name} {lab}/")
+
+
+if __name__ == '__main__':
+    unittest.main()
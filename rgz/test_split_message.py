@@ -0,0 +1,39 @@
+import os
+import unittest
+
+# rgz.py создает Bot при импорте - нужен токен правильного формата
+os.environ.setdefault('TELEGRAM_API_TOKEN', '1:test')
+
+from rgz import split_message
+
+
+class TestSplitMessage(unittest.TestCase):
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(list(split_message("a\nb\n", 10)), ["a\nb\n"])
+        self.assertEqual(list(split_message("", 10)), [])
+
+    def test_exact_limit(self):
+        self.assertEqual(list(split_message("abcd\nefgh", 5)), ["abcd\n", "efgh"])
+        self.assertEqual(list(split_message("a" * 10, 10)), ["a" * 10])
+
+    def test_splits_on_line_boundaries(self):
+        text = "".join(f"line {i}\n" for i in range(100))
+        chunks = list(split_message(text, 50))
+        self.assertEqual("".join(chunks), text)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 50)
+            self.assertTrue(chunk.endswith("\n"))
+
+    def test_over_long_line_is_cut(self):
+        chunks = list(split_message("head\n" + "x" * 25 + "\ntail", 10))
+        self.assertEqual(chunks, ["head\n", "x" * 10, "x" * 10, "xxxxx\ntail"])
+
+    def test_no_blank_chunks(self):
+        # Остаток длинной строки - только перевод строки, дальше пустые строки
+        chunks = list(split_message("x" * 10 + "\n\n\n" + "y", 10))
+        self.assertEqual([c.strip() for c in chunks], ["x" * 10, "y"])
+        self.assertEqual(list(split_message("\n" * 30, 10)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from validation import MAX_AMOUNT, parse_amount, parse_date, parse_operation_type
+
+
+class TestParseAmount(unittest.TestCase):
+    def test_rounds_to_kopecks_half_up(self):
+        self.assertEqual(parse_amount("100"), Decimal('100.00'))
+        self.assertEqual(parse_amount(" 12,5 "), Decimal('12.50'))
+        self.assertEqual(parse_amount("0.005"), Decimal('0.01'))
+        self.assertEqual(parse_amount("1.005"), Decimal('1.01'))
+        self.assertEqual(parse_amount("1.004"), Decimal('1.00'))
+
+    def test_numeric_12_2_bounds(self):
+        # Граница NUMERIC(12, 2): 10 знаков до запятой
+        self.assertEqual(parse_amount("9999999999.99"), MAX_AMOUNT)
+        self.assertEqual(parse_amount("9999999999.994"), MAX_AMOUNT)
+        self.assertEqual(parse_amount("0.01"), Decimal('0.01'))
+        for text in ["9999999999.995", "10000000000", "1e10", "0.004", "0", "-1", "-0.01"]:
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, "некорректная сумма"):
+                    parse_amount(text)
+
+    def test_not_a_number(self):
+        for text in ["", "abc", "1.2.3", "NaN", "Infinity", "sNaN"]:
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, "некорректная сумма"):
+                    parse_amount(text)
+
+
+class TestParseOther(unittest.TestCase):
+    def test_date(self):
+        self.assertEqual(parse_date(" 2026-03-01 "), date(2026, 3, 1))
+        for text in ["01.03.2026", "2026-02-30", ""]:
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, "некорректная дата"):
+                    parse_date(text)
+
+    def test_operation_type(self):
+        self.assertEqual(parse_operation_type(" расход "), 'РАСХОД')
+        self.assertEqual(parse_operation_type("Доход"), 'ДОХОД')
+        with self.assertRaisesRegex(ValueError, "неизвестный тип операции"):
+            parse_operation_type("перевод")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+import db
+from write_behind import OperationWriter
+
+
+class FakeConnection:
+    # Таблица operations в памяти: строки пакета видны только после коммита
+    def __init__(self):
+        self.rows = []
+        self.batches = []
+        self.totals = []
+        self.fail = None
+        self._pending = None
+
+    @asynccontextmanager
+    async def transaction(self):
+        self._pending = ([], [])
+        try:
+            yield
+        except BaseException:
+            self._pending = None
+            raise
+        rows, totals = self._pending
+        self._pending = None
+        self.rows.extend(rows)
+        self.batches.append(len(rows))
+        self.totals.extend(totals)
+
+    async def copy_records_to_table(self, table, records, columns):
+        if self.fail is not None:
+            raise self.fail
+        self._pending[0].extend(records)
+
+    async def executemany(self, query, args):
+        self._pending[1].extend(args)
+
+
+class TestOperationWriter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.conn = FakeConnection()
+
+        @asynccontextmanager
+        async def acquire():
+            yield self.conn
+
+        patcher = mock.patch.object(db, 'acquire', acquire)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def make_writer(self, **kwargs):
+        writer = OperationWriter(**kwargs)
+        writer.start()
+        self.addAsyncCleanup(writer.stop)
+        return writer
+
+    def submit(self, writer, i, chat_id=1):
+        return asyncio.create_task(writer.submit(chat_id, date(2026, 3, 1 + i % 28), Decimal(i), 'РАСХОД'))
+
+    async def test_batch_flushed_at_batch_size(self):
+        # Задержка большая - пакеты сбрасываются только по размеру
+        writer = await self.make_writer(batch_size=5, max_delay=60)
+        tasks = [self.submit(writer, i) for i in range(10)]
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        self.assertEqual(self.conn.batches, [5, 5])
+
+    async def test_partial_batch_flushed_after_max_delay(self):
+        writer = await self.make_writer(batch_size=100, max_delay=0.05)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = [self.submit(writer, i) for i in range(3)]
+        await asyncio.sleep(0.02)
+        self.assertEqual(self.conn.batches, [])
+        self.assertFalse(any(task.done() for task in tasks))
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        self.assertGreaterEqual(loop.time() - started, 0.05)
+        self.assertEqual(self.conn.batches, [3])
+
+    async def test_stop_flushes_queued_operations(self):
+        writer = OperationWriter(batch_size=100, max_delay=60)
+        writer.start()
+        tasks = [self.submit(writer, i) for i in range(7)]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(writer.stop(), 1)
+        await asyncio.gather(*tasks)
+        self.assertEqual(len(self.conn.rows), 7)
+        with self.assertRaises(RuntimeError):
+            await writer.submit(1, date(2026, 3, 1), Decimal(1), 'РАСХОД')
+
+    async def test_failed_batch_fails_every_caller(self):
+        writer = await self.make_writer(batch_size=3, max_delay=60)
+        self.conn.fail = OSError("соединение разорвано")
+        tasks = [self.submit(writer, i) for i in range(3)]
+        with self.assertLogs('write_behind', 'ERROR'):
+            results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1)
+        self.assertEqual(results, [self.conn.fail] * 3)
+        self.assertEqual(self.conn.rows, [])
+        self.assertEqual(self.conn.totals, [])
+
+        # Следующий пакет пишется как обычно
+        self.conn.fail = None
+        await asyncio.wait_for(asyncio.gather(*(self.submit(writer, i) for i in range(3))), 1)
+        self.assertEqual(len(self.conn.rows), 3)
+
+    async def test_every_operation_written_once(self):
+        writer = await self.make_writer(batch_size=7, max_delay=0.001)
+        tasks = []
+        for i in range(100):
+            tasks.append(self.submit(writer, i, chat_id=i % 3))
+            if i % 10 == 0:
+                await asyncio.sleep(0.002)
+        await asyncio.wait_for(asyncio.gather(*tasks), 2)
+        self.assertEqual(sorted(amount for _, amount, _, _ in self.conn.rows), [Decimal(i) for i in range(100)])
+        self.assertTrue(all(size <= 7 for size in self.conn.batches))
+        # Итоги по месяцам сходятся с записанными строками
+        by_chat = {}
+        for chat_id, month, operation_type, total in self.conn.totals:
+            self.assertEqual((month, operation_type), (date(2026, 3, 1), 'РАСХОД'))
+            by_chat[chat_id] = by_chat.get(chat_id, 0) + total
+        self.assertEqual(by_chat, {c: sum(Decimal(i) for i in range(100) if i % 3 == c) for c in range(3)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+OPERATION_TYPES = ("РАСХОД", "ДОХОД")
+# Суммы хранятся в NUMERIC(12, 2): копейки и не больше 10 знаков до запятой
+AMOUNT_STEP = Decimal('0.01')
+MAX_AMOUNT = Decimal('9999999999.99')
+
+
+def parse_operation_type(text: str) -> str:
+    operation_type = text.strip().upper()
+    if operation_type not in OPERATION_TYPES:
+        raise ValueError(f"неизвестный тип операции: {text}")
+    return operation_type
+
+
+def parse_amount(text: str) -> Decimal:
+    try:
+        amount = Decimal(text.strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"некорректная сумма: {text}")
+    if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT + AMOUNT_STEP:
+        raise ValueError(f"некорректная сумма: {text}")
+    # Округляем как база, чтобы итоги совпадали с сохраненными строками
+    amount = amount.quantize(AMOUNT_STEP, rounding=ROUND_HALF_UP)
+    if amount <= 0 or amount > MAX_AMOUNT:
+        raise ValueError(f"некорректная сумма: {text}")
+    return amount
+
+
+def parse_date(text: str) -> date:
+    try:
+        return datetime.strptime(text.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"некорректная дата: {text}")
@@ -0,0 +1,102 @@
+# Отложенная пакетная запись операций. Обработчики кладут операцию в
+# очередь и ждут, пока фоновая задача закоммитит пакет, в котором она
+# оказалась. Пакет сбрасывается при наборе batch_size операций или через
+# max_delay секунд после первой операции в пакете.
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+import db
+import rollup
+
+logger = logging.getLogger(__name__)
+
+
+class OperationWriter:
+    def __init__(self, batch_size: int = 500, max_delay: float = 0.005):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Дописываем все, что уже в очереди, и останавливаем задачу
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, chat_id: int, operation_date: date, amount: Decimal, operation_type: str):
+        if self._task is None:
+            raise RuntimeError("OperationWriter не запущен")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((operation_date, amount, chat_id, operation_type), future))
+        await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # После сигнала остановки в очереди могли остаться операции
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                batch.append(item)
+        if batch:
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        records = [record for record, _ in batch]
+        totals = defaultdict(Decimal)
+        for operation_date, amount, chat_id, operation_type in records:
+            totals[(chat_id, operation_date.replace(day=1), operation_type)] += amount
+
+        try:
+            async with db.acquire() as conn:
+                async with conn.transaction():
+                    await conn.copy_records_to_table(
+                        'operations',
+                        records=records,
+                        columns=['date', 'sum', 'chat_id', 'type_operation']
+                    )
+                    await rollup.add_totals(conn, [key + (total,) for key, total in totals.items()])
+        except Exception as e:
+            logger.error(f"Ошибка записи пакета из {len(batch)} операций: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
@@ -0,0 +1,12 @@
+# Точка входа WSGI для production:
+#
+#   gunicorn wsgi:app
+#
+# Каждый процесс gunicorn импортирует flask_server сам и запускает свой поток
+# обновления курсов, поэтому --preload не используется: потоки, запущенные
+# до fork, в рабочие процессы не переходят. Снимки процессов совпадают только
+# при RATES_PROVIDER=static/file; с http gunicorn.conf.py оставляет один
+# процесс. Историю курсов в файл пишет один процесс (см. rate_history.py).
+from flask_server import app
+
+__all__ = ['app']